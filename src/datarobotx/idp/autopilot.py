@@ -16,7 +16,7 @@ from typing import Any, Dict, List, Optional, Tuple
 
 import datarobot as dr
 
-from datarobotx.idp.common.hashing import get_hash
+from datarobotx.idp.common.hashing import get_hash, get_hash_async
 from datarobotx.idp.projects import (
     get_or_create_project_from_dataset,
     get_or_create_project_from_dataset_async,
@@ -256,7 +256,7 @@ async def get_or_create_autopilot_run_async(
         )
         worker_count_analyze_and_model = analyze_and_model_config.pop("worker_count", None)
 
-    project_config_token = get_hash(
+    project_config_token = await get_hash_async(
         name,
         dataset_id,
         create_from_dataset_config,
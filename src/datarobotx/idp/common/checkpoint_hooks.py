@@ -13,27 +13,149 @@
 
 import functools
 import logging
-from typing import Any, Dict
+import os
+import threading
+from typing import Any, Callable, Dict, NamedTuple, Optional, Set
 
 try:
     from kedro.framework.hooks import hook_impl
-    from kedro.io import DataCatalog
+    from kedro.io import AbstractDataset, DataCatalog, MemoryDataset
+    from kedro.pipeline import Pipeline
     from kedro.pipeline.node import Node
 except ImportError as e:
     raise ImportError("Consider including kedro in your project requirements`") from e
 
-from datarobotx.idp.common.hashing import get_hash
+from datarobotx.idp.common.checkpoint_manifest import CheckpointManifest
+from datarobotx.idp.common.handle_io import dataset_fingerprint
+from datarobotx.idp.common.hashing import get_digest, get_hash
+from datarobotx.idp.common.output_cache import OutputCache
+
+
+class _PersistedOutput:
+    """Stands in for a node output left in place by a checkpoint hit."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.name!r})"
+
+
+class _CheckpointedDataset(AbstractDataset[Any, Any]):
+    """Wraps an output dataset so that saving a `_PersistedOutput` is a no-op.
+
+    Loads are delegated, so a downstream node still receives the stored data.
+    """
+
+    def __init__(self, dataset: AbstractDataset[Any, Any]) -> None:
+        self._dataset = dataset
+
+    def load(self) -> Any:
+        return self._dataset.load()
+
+    def save(self, data: Any) -> None:
+        if not isinstance(data, _PersistedOutput):
+            self._dataset.save(data)
+
+    def _exists(self) -> bool:
+        return self._dataset.exists()
+
+    def _release(self) -> None:
+        self._dataset.release()
+
+    def _describe(self) -> Dict[str, Any]:
+        return {"dataset": str(self._dataset)}
+
+
+# outputs a skipped node returns, keyed by node name; set by before_node_run and
+# consumed by the node function, which kedro runners call in the same thread
+_skipped_outputs = threading.local()
+_NOT_SKIPPED = object()
+
+
+class _CheckpointedFunction:
+    """Node function that returns outputs set aside by `CheckpointHooks` instead of running.
+
+    Pipelines run copies of checkpointed nodes with wrapped functions, so node
+    objects are never modified. Picklable whenever the wrapped function is.
+    """
+
+    def __init__(self, func: Callable[..., Any], node_name: str) -> None:
+        functools.update_wrapper(self, func)
+        if not hasattr(func, "__name__"):
+            # unnamed nodes are named after their function the way kedro does,
+            # so copies keep the name their checksums are recorded under
+            name = repr(func)
+            self.__name__ = "<partial>" if "functools.partial" in name else name
+        self.func = func
+        self.node_name = node_name
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        outputs = vars(_skipped_outputs).pop(self.node_name, _NOT_SKIPPED)
+        if outputs is _NOT_SKIPPED:
+            return self.func(*args, **kwargs)
+        return outputs
+
+
+class _PendingCheckpoint(NamedTuple):
+    checksum: str
+    lineage: Optional[str]
+    cache_key: Optional[str]
+    from_cache: bool
 
 
 class CheckpointHooks:
     """Attempt to checkpoint/cache for nodes that request it.
 
     Users can request a node use checkpointing by setting the tag 'checkpoint' on the node.
+    Node functions are tokenized according to the hashing options in effect, e.g.
+    ``set_hashing_options(callable_tokens="bytecode")`` also invalidates checkpoints
+    when a helper function called by the node changes.
+
+    Before a pipeline runs, checkpointed nodes whose inputs are unchanged since
+    their last recorded run, judged from dataset metadata and upstream nodes
+    rather than by loading data, are pruned from the run altogether; see
+    `before_pipeline_run`. Nodes that are not pruned are still skipped if the
+    checksum of their loaded inputs matches.
+
+    Skipping relies on `before_pipeline_run` replacing checkpointed nodes of
+    the pipeline being run with copies whose functions can return stored
+    outputs; the nodes themselves are not modified. Nodes that were not
+    prepared, e.g. because a runner was called directly, have their function
+    wrapped in place by `before_node_run` instead. State is kept per node
+    name under a lock, so the hooks can be used with ThreadRunner and, when
+    registered in the project settings, ParallelRunner. In ParallelRunner
+    worker processes, checksums are written to the manifest's journal as they
+    are recorded.
+
+    Parameters
+    ----------
+    prune : bool, default=True
+        Plan skips before the pipeline runs; if false, nodes are only skipped
+        after kedro has loaded their inputs and no lineage checksums, which
+        pruning compares, are computed
+    manifest : CheckpointManifest, optional
+        Keep the checksums of all nodes in one manifest, read when the
+        pipeline starts and written when it ends, instead of in a
+        ``<node>_checksum`` catalog dataset per node
+    output_cache : OutputCache, optional
+        Also keep the outputs of every input combination a checkpointed node
+        has seen, so that returning to earlier inputs reuses their outputs
+        instead of re-executing the node
     """
 
-    def __init__(self) -> None:
-        self.node_original_func = {}  # type: ignore
-        self.node_inputs_hash = {}  # type: ignore
+    def __init__(
+        self,
+        prune: bool = True,
+        manifest: Optional[CheckpointManifest] = None,
+        output_cache: Optional[OutputCache] = None,
+    ) -> None:
+        self.prune = prune
+        self.manifest = manifest
+        self.output_cache = output_cache
+        self._pending: Dict[str, _PendingCheckpoint] = {}
+        self._lock = threading.Lock()
+        self._pipeline_pid: Optional[int] = None
         self.logger = logging.getLogger(__name__)
 
     @property
@@ -47,6 +169,154 @@ class CheckpointHooks:
         assert len(node.name)
         return f"{node.name}_checksum"
 
+    @staticmethod
+    def _node_func(node: Node) -> Callable[..., Any]:
+        """Node function as written, without the wrapper added for skipping."""
+        func = node.func
+        return func.func if isinstance(func, _CheckpointedFunction) else func
+
+    def load_checksum(self, node: Node, catalog: DataCatalog) -> str:
+        """Checksum recorded for a node; raises if there is none."""
+        if self.manifest is None:
+            return str(catalog.load(self.checksum_catalog_name(node)))
+        checksum = self.manifest.get(node.name)
+        if checksum is None:
+            raise KeyError(f"No checksum recorded for node {node.name}")
+        return checksum
+
+    def save_checksum(self, node: Node, catalog: DataCatalog, checksum: str) -> None:
+        """Record the checksum of a node."""
+        if self.manifest is None:
+            catalog.save(self.checksum_catalog_name(node), checksum)
+        else:
+            worker = os.getpid() != self._pipeline_pid
+            if worker:
+                # e.g. a ParallelRunner worker, which runs no after_pipeline_run;
+                # journal entries are merged by the flush in after_pipeline_run
+                self.manifest.compact = False
+            self.manifest.set(node.name, checksum)
+            if worker:
+                self.manifest.flush(compact=False)
+
+    def lineage_checksum(
+        self, node: Node, catalog: DataCatalog, inputs: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """Checksum of a node's function and the metadata of its input datasets.
+
+        File-backed inputs contribute their configuration and filesystem
+        metadata (see `dataset_fingerprint`), so this does not read their data.
+        Other inputs contribute their values, taken from `inputs` if given
+        rather than loaded again.
+        """
+        load = inputs.__getitem__ if inputs is not None else None
+        fingerprints = {name: dataset_fingerprint(catalog, name, load) for name in node.inputs}
+        return get_hash(self._node_func(node), "lineage", **fingerprints)
+
+    def _is_unchanged(self, node: Node, catalog: DataCatalog) -> bool:
+        """Whether a node's recorded lineage checksum matches and its outputs still exist."""
+        if self.checksum_tag not in node.tags:
+            return False
+        try:
+            recorded = self.load_checksum(node, catalog).split("\n")
+            return (
+                len(recorded) == 2
+                and recorded[1] == self.lineage_checksum(node, catalog)
+                and all(catalog.exists(name) for name in node.outputs)
+            )
+        except Exception:
+            return False
+
+    @hook_impl
+    def before_pipeline_run(
+        self, run_params: Dict[str, Any], pipeline: Pipeline, catalog: DataCatalog
+    ) -> None:
+        """Prune unchanged checkpointed nodes and prepare the others for skipping.
+
+        A node is pruned if its lineage checksum matches the one recorded with
+        its last checkpoint, its outputs exist and every node it depends on in
+        this pipeline is pruned as well. Datasets only consumed by pruned nodes
+        are never loaded.
+        """
+        self._pipeline_pid = os.getpid()
+        if self.manifest is not None:
+            self.manifest.load()
+        pruned: Set[Node] = set()
+        if self.prune:
+            dependencies = pipeline.node_dependencies
+            for node in pipeline.nodes:  # topologically sorted
+                if dependencies[node] <= pruned and self._is_unchanged(node, catalog):
+                    pruned.add(node)
+        if pruned:
+            self.logger.info(
+                f"Skipping checkpointed nodes with unchanged inputs: "
+                f"{', '.join(sorted(node.name for node in pruned))}"
+            )
+        nodes = [
+            node._copy(func=_CheckpointedFunction(node.func, node.name))
+            if self.checksum_tag in node.tags and not isinstance(node.func, _CheckpointedFunction)
+            else node
+            for node in pipeline.nodes
+            if node not in pruned
+        ]
+        # hook return values are discarded, so the pipeline kedro is about to
+        # run (a copy made by Pipeline.filter) is re-initialized in place after
+        # dropping its cached properties
+        vars(pipeline).clear()
+        Pipeline.__init__(pipeline, nodes)
+
+    @staticmethod
+    def _checkpointed_output(name: str, catalog: DataCatalog) -> Any:
+        """Value a skipped node returns for one of its outputs.
+
+        Outputs persisted outside of memory are not loaded: a placeholder is
+        returned and the dataset wrapped so that kedro saving the placeholder
+        leaves the stored data untouched. Other outputs are loaded.
+        """
+        dataset = catalog._get_dataset(name)
+        if isinstance(dataset, _CheckpointedDataset):
+            dataset = dataset._dataset
+        if isinstance(dataset, MemoryDataset):
+            return catalog.load(name)
+        if not dataset.exists():
+            raise FileNotFoundError(f"Checkpointed output {name} does not exist")
+        catalog.add(name, _CheckpointedDataset(dataset), replace=True)
+        return _PersistedOutput(name)
+
+    @staticmethod
+    def _skip(node: Node, outputs_dict: Dict[str, Any]) -> None:
+        """Make the wrapped function of a node return the given outputs, in this thread."""
+        if len(node.outputs) == 1:
+            outputs = outputs_dict[node.outputs[0]]
+        else:
+            outputs = tuple(outputs_dict[name] for name in node.outputs)
+        setattr(_skipped_outputs, node.name, outputs)
+
+    def _cache_key(self, node: Node, inputs: Dict[str, Any]) -> Optional[str]:
+        """Full-length digest of a node's function and inputs, if outputs are cached."""
+        if self.output_cache is None:
+            return None
+        try:
+            return get_digest(self._node_func(node), **inputs)
+        except Exception:
+            return None
+
+    def _reuse_cached_outputs(self, node: Node, cache_key: str) -> bool:
+        """Skip a node if the output cache holds outputs for its inputs."""
+        if self.output_cache is None:
+            return False
+        try:
+            outputs_dict = self.output_cache.get(node.name, cache_key)
+        except Exception:
+            self.logger.warning(
+                f"Could not read cached outputs for node: {node.name}", exc_info=True
+            )
+            return False
+        if outputs_dict is None or set(outputs_dict) != set(node.outputs):
+            return False
+        self.logger.info(f"Reusing cached outputs for node: {node.name}...")
+        self._skip(node, outputs_dict)
+        return True
+
     @hook_impl
     def before_node_run(
         self,
@@ -56,29 +326,53 @@ class CheckpointHooks:
         is_async: bool,
         session_id: str,
     ) -> None:
-        """Attempt to skip node execution if node previously completed with same inputs."""
+        """Attempt to skip node execution if node previously completed with same inputs.
+
+        On a hit, persisted outputs are not loaded; other hooks see
+        placeholders for them in ``after_node_run`` and ``before_dataset_saved``.
+        Nodes not prepared by `before_pipeline_run` are prepared here, with a
+        warning, since they cannot have been pruned.
+        """
         if self.checksum_tag not in node.tags:
             return
+        with self._lock:
+            if not isinstance(node.func, _CheckpointedFunction):
+                self.logger.warning(
+                    f"Checkpointed node {node.name} was not prepared by before_pipeline_run, "
+                    f"e.g. because the runner was called directly; wrapping its function"
+                )
+                # kedro's setter for hooks decorating node functions
+                node.func = _CheckpointedFunction(node.func, node.name)
+
+        lineage: Optional[str] = None
+        if self.prune:
+            try:
+                lineage = self.lineage_checksum(node, catalog, inputs)
+            except Exception:
+                pass  # the node can still be skipped on the checksum of its inputs
 
         checksum = ""
         try:
-            checksum = get_hash(node.func, **inputs)
-            checksum_catalog_name = self.checksum_catalog_name(node)
-            prior_checksum = catalog.load(checksum_catalog_name)
-            assert prior_checksum == checksum
-
-            self.logger.info(f"Loading previously checkpointed outputs for node: {node.name}...")
-            outputs_dict = {name: catalog.load(name) for name in node.outputs}
-            if len(node.outputs) == 1:
-                outputs = outputs_dict[node.outputs[0]]
-            else:
-                outputs = tuple(outputs_dict[name] for name in node.outputs)
-
-            self.node_original_func[id(node)] = node.func
-            node.func = functools.wraps(node.func)(lambda *args, **kwargs: outputs)
+            checksum = get_hash(self._node_func(node), **inputs)
+            prior_checksum = self.load_checksum(node, catalog)
+            assert prior_checksum.split("\n")[0] == checksum
+            if lineage is not None and prior_checksum != f"{checksum}\n{lineage}":
+                # e.g. an upstream node rewrote identical outputs
+                self.save_checksum(node, catalog, f"{checksum}\n{lineage}")
+
+            self.logger.info(f"Reusing previously checkpointed outputs for node: {node.name}...")
+            outputs_dict = {name: self._checkpointed_output(name, catalog) for name in node.outputs}
+            self._skip(node, outputs_dict)
+            return
         except Exception:
-            if len(checksum):
-                self.node_inputs_hash[id(node)] = checksum
+            pass
+        if len(checksum):
+            cache_key = self._cache_key(node, inputs)
+            from_cache = cache_key is not None and self._reuse_cached_outputs(node, cache_key)
+            with self._lock:
+                self._pending[node.name] = _PendingCheckpoint(
+                    checksum, lineage, cache_key, from_cache
+                )
 
     @hook_impl
     def after_node_run(
@@ -90,12 +384,63 @@ class CheckpointHooks:
         is_async: bool,
         session_id: str,
     ) -> None:
-        """Store checksum for checkpointed nodes after execution."""
-        if self.checksum_tag in node.tags:
-            if id(node) in self.node_original_func:
-                node.func = self.node_original_func.pop(id(node))
-            if id(node) in self.node_inputs_hash:
-                checksum_catalog_name = self.checksum_catalog_name(node)
-                checksum = self.node_inputs_hash.pop(id(node))
-                self.logger.info(f"Recording an outputs checkpoint for node: {node.name}...")
-                catalog.save(checksum_catalog_name, checksum)
+        """Store checksum (and outputs, if caching) for checkpointed nodes after execution."""
+        if self.checksum_tag not in node.tags:
+            return
+        with self._lock:
+            pending = self._pending.pop(node.name, None)
+        if pending is None:
+            return
+        if (
+            self.output_cache is not None
+            and pending.cache_key is not None
+            and not pending.from_cache
+        ):
+            try:
+                self.output_cache.put(node.name, pending.cache_key, outputs)
+            except Exception:
+                self.logger.warning(f"Could not cache outputs for node: {node.name}", exc_info=True)
+        checksum = pending.checksum
+        if pending.lineage is not None:
+            checksum += "\n" + pending.lineage
+        self.logger.info(f"Recording an outputs checkpoint for node: {node.name}...")
+        self.save_checksum(node, catalog, checksum)
+
+    @hook_impl
+    def on_node_error(
+        self,
+        error: Exception,
+        node: Node,
+        catalog: DataCatalog,
+        inputs: Dict[str, Any],
+        is_async: bool,
+        session_id: str,
+    ) -> None:
+        """Forget the checksum of a node that failed."""
+        with self._lock:
+            self._pending.pop(node.name, None)
+        vars(_skipped_outputs).pop(node.name, None)
+
+    @hook_impl
+    def after_pipeline_run(
+        self,
+        run_params: Dict[str, Any],
+        run_result: Dict[str, Any],
+        pipeline: Pipeline,
+        catalog: DataCatalog,
+    ) -> None:
+        """Write the checksums recorded during the run to the manifest."""
+        if self.manifest is not None:
+            self.manifest.flush()
+
+    @hook_impl
+    def on_pipeline_error(
+        self,
+        error: Exception,
+        run_params: Dict[str, Any],
+        pipeline: Pipeline,
+        catalog: DataCatalog,
+    ) -> None:
+        """Keep the checksums of nodes that completed before the failure."""
+        if self.manifest is not None:
+            self.manifest.flush()
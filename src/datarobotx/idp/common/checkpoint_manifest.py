@@ -0,0 +1,194 @@
+#
+# Copyright 2024 DataRobot, Inc. and its affiliates.
+#
+# All rights reserved.
+#
+# DataRobot, Inc.
+#
+# This is proprietary source code of DataRobot, Inc. and its
+# affiliates.
+#
+# Released under the terms of DataRobot Tool and Utility Agreement.
+# https://www.datarobot.com/wp-content/uploads/2021/07/DataRobot-Tool-and-Utility-Agreement.pdf
+
+from copy import deepcopy
+import functools
+import json
+import threading
+import time
+from typing import IO, Any, Callable, Dict, List, Optional, Tuple
+import uuid
+
+try:
+    import fsspec
+    from kedro.io.core import get_protocol_and_path
+except ImportError as e:
+    raise ImportError("Consider including kedro in your project requirements`") from e
+
+_MANIFEST_FORMAT_VERSION = 1
+
+
+def write_atomic(
+    fs: Any, path: str, write: Callable[[IO[Any]], None], binary: bool = False
+) -> None:
+    """Write a file on an fsspec filesystem so that readers never observe a partial file.
+
+    The content is written to a temporary file next to `path` that is then
+    moved over it.
+    """
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        if binary:
+            with fs.open(tmp_path, "wb") as f:
+                write(f)
+        else:
+            with fs.open(tmp_path, "w", encoding="utf-8") as f:
+                write(f)
+        fs.mv(tmp_path, path)
+    except BaseException:
+        if fs.exists(tmp_path):
+            fs.rm(tmp_path)
+        raise
+
+
+class CheckpointManifest:
+    """Node checksums of a pipeline kept in a single JSON document.
+
+    Replaces one ``<node>_checksum`` catalog dataset per node with one object
+    on any fsspec filesystem: the document is read once, on first use, and
+    updates are buffered and written back in a batch by `flush`.
+
+    Writes go to a temporary object that is then moved over the manifest, so
+    readers never observe a partial document. Before writing, the manifest is
+    re-read and pending updates are merged into it, so within a process
+    pipelines sharing a manifest only overwrite each other's checksums for the
+    same node names.
+
+    Processes writing concurrently, e.g. ParallelRunner workers, flush with
+    ``compact=False`` and set `compact` to False so that flushes triggered by
+    `flush_interval` do the same: their updates are written to new objects in a journal
+    next to the manifest, which readers merge into the document, and only the
+    next compacting flush rewrites the document. Separate pipeline runs
+    compacting at the same moment can still lose each other's updates; a lost
+    checksum only makes its node run again.
+
+    Parameters
+    ----------
+    filepath : str
+        Location of the manifest, e.g. ``s3://bucket/checkpoints.json``
+    flush_interval : int, optional
+        Also flush after this many updates; by default updates are only
+        written when `flush` is called, e.g. at the end of a pipeline run
+    credentials : dict, optional
+        Credentials passed to the fsspec filesystem
+    fs_args : dict, optional
+        Extra arguments passed to the fsspec filesystem
+    """
+
+    def __init__(
+        self,
+        filepath: str,
+        flush_interval: Optional[int] = None,
+        credentials: Optional[Dict[str, Any]] = None,
+        fs_args: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        _fs_args = deepcopy(fs_args) or {}
+        _credentials = deepcopy(credentials) or {}
+
+        protocol, path = get_protocol_and_path(filepath)
+        if protocol == "file":
+            _fs_args.setdefault("auto_mkdir", True)
+
+        self._path = path
+        self._fs = fsspec.filesystem(protocol, **_credentials, **_fs_args)
+        self.flush_interval = flush_interval
+        self.compact = True
+        self._checksums: Optional[Dict[str, str]] = None
+        self._pending: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def _journal_path(self) -> str:
+        return f"{self._path}.journal"
+
+    def _read_document(self) -> Dict[str, str]:
+        try:
+            with self._fs.open(self._path, "r", encoding="utf-8") as f:
+                content = json.load(f)
+            if content.get("version") == _MANIFEST_FORMAT_VERSION:
+                return dict(content["checksums"])
+        except (FileNotFoundError, ValueError, KeyError, AttributeError):
+            pass  # a missing or corrupt manifest is simply rebuilt
+        return {}
+
+    def _read_journal(self) -> Tuple[List[str], Dict[str, str]]:
+        """Journal entries, oldest first, and the checksums they record."""
+        try:
+            paths = sorted(p for p in self._fs.find(self._journal_path) if p.endswith(".json"))
+        except FileNotFoundError:
+            return [], {}
+        read, checksums = [], {}
+        for path in paths:
+            try:
+                with self._fs.open(path, "r", encoding="utf-8") as f:
+                    content = json.load(f)
+                checksums.update(content["checksums"])
+            except (FileNotFoundError, ValueError, KeyError, AttributeError, TypeError):
+                continue  # e.g. compacted by another process in the meantime
+            read.append(path)
+        return read, checksums
+
+    def _read(self) -> Dict[str, str]:
+        return {**self._read_document(), **self._read_journal()[1]}
+
+    def _ensure_loaded(self) -> Dict[str, str]:
+        if self._checksums is None:
+            self._checksums = self._read()
+        return self._checksums
+
+    def load(self) -> None:
+        """(Re-)read the manifest, keeping updates that were not flushed yet."""
+        with self._lock:
+            self._checksums = {**self._read(), **self._pending}
+
+    def get(self, name: str) -> Optional[str]:
+        """Checksum recorded for a node, if any."""
+        with self._lock:
+            return self._ensure_loaded().get(name)
+
+    def set(self, name: str, checksum: str) -> None:
+        """Record the checksum of a node; written by the next flush."""
+        with self._lock:
+            self._ensure_loaded()[name] = checksum
+            self._pending[name] = checksum
+            flush = self.flush_interval is not None and len(self._pending) >= self.flush_interval
+        if flush:
+            self.flush(compact=self.compact)
+
+    def flush(self, compact: bool = True) -> None:
+        """Atomically write pending updates, merged into the current manifest.
+
+        With ``compact=False``, pending updates are instead written to a new
+        journal entry, which is safe from any number of processes at once.
+        """
+        with self._lock:
+            if not compact:
+                if self._pending:
+                    content = {"version": _MANIFEST_FORMAT_VERSION, "checksums": self._pending}
+                    path = f"{self._journal_path}/{time.time_ns():020d}-{uuid.uuid4().hex}.json"
+                    write_atomic(self._fs, path, functools.partial(json.dump, content))
+                    self._pending = {}
+                return
+            merged, journal = self._read_journal()
+            if not self._pending and not merged:
+                return
+            checksums = {**self._read_document(), **journal, **self._pending}
+            content = {"version": _MANIFEST_FORMAT_VERSION, "checksums": checksums}
+            write_atomic(self._fs, self._path, functools.partial(json.dump, content))
+            for path in merged:
+                try:
+                    self._fs.rm(path)
+                except FileNotFoundError:
+                    pass
+            self._checksums = checksums
+            self._pending = {}
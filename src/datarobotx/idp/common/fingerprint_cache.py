@@ -0,0 +1,135 @@
+#
+# Copyright 2024 DataRobot, Inc. and its affiliates.
+#
+# All rights reserved.
+#
+# DataRobot, Inc.
+#
+# This is proprietary source code of DataRobot, Inc. and its
+# affiliates.
+#
+# Released under the terms of DataRobot Tool and Utility Agreement.
+# https://www.datarobot.com/wp-content/uploads/2021/07/DataRobot-Tool-and-Utility-Agreement.pdf
+
+"""Persistent file fingerprints for skipping re-reads of unchanged files.
+
+Fingerprints are tiered: the first tier is the file's stat fields plus, for
+large files, a digest of a few sampled blocks. It costs a stat and a handful of
+small reads, and the full content digest is only recomputed when it changes.
+"""
+
+from hashlib import sha256
+import json
+import os
+from pathlib import Path
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+_INDEX_FORMAT_VERSION = 1
+# files modified this recently may still change within the same mtime tick
+_RACY_WINDOW_NS = 2 * 10**9
+SAMPLE_BLOCK_SIZE = 64 * 1024
+SAMPLE_BLOCKS = 4
+# smaller files are cheap enough to re-read that sampling would not pay off
+SAMPLE_THRESHOLD = 16 * 1024 * 1024
+
+
+def default_cache_dir() -> Path:
+    """Directory where fingerprint indexes are stored by default."""
+    cache_home = os.environ.get("XDG_CACHE_HOME", str(Path.home() / ".cache"))
+    return Path(cache_home) / "datarobotx-idp" / "fingerprints"
+
+
+def write_json_atomic(path: Path, content: Any) -> None:
+    """Write a JSON document so that readers never observe a partial file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(content, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def stat_key(st: os.stat_result) -> List[int]:
+    """Fields of a stat result that invalidate a fingerprint when changed."""
+    return [st.st_ino, st.st_size, st.st_mtime_ns]
+
+
+def sample_digest(path: str, size: int) -> str:
+    """Digest of SAMPLE_BLOCKS blocks spread evenly over a file, first and last included."""
+    hasher = sha256()
+    last_offset = max(size - SAMPLE_BLOCK_SIZE, 0)
+    with open(path, "rb") as f:
+        for i in range(SAMPLE_BLOCKS):
+            f.seek(last_offset * i // (SAMPLE_BLOCKS - 1))
+            hasher.update(f.read(SAMPLE_BLOCK_SIZE))
+    return hasher.hexdigest()
+
+
+def fingerprint(path: str, st: os.stat_result) -> List[Any]:
+    """First-tier fingerprint of a file: stat fields, plus sampled blocks if it is large.
+
+    Sampling catches rewrites that preserve size and mtime, e.g. copies made
+    with ``cp -p`` or ``rsync -t`` over an existing file.
+    """
+    key: List[Any] = stat_key(st)
+    if st.st_size >= SAMPLE_THRESHOLD:
+        key.append(sample_digest(path, st.st_size))
+    return key
+
+
+def is_racy(st: os.stat_result) -> bool:
+    """Whether a file was modified too recently for its stat to be trusted."""
+    return time.time_ns() - st.st_mtime_ns < _RACY_WINDOW_NS
+
+
+class FingerprintIndex:
+    """On-disk index of digests keyed by path and first-tier fingerprint.
+
+    One index is kept per hashed root path. Each entry records the fingerprint
+    of a file (see `fingerprint`) at the time its digest was computed; a
+    lookup only succeeds while the fingerprint is unchanged. Lookups and records are single
+    dict operations, so an index can be shared by the threads hashing a tree.
+
+    Parameters
+    ----------
+    index_path : Path
+        JSON file backing the index; created on first save
+    """
+
+    def __init__(self, index_path: Path) -> None:
+        self.index_path = index_path
+        self.entries: Dict[str, List[Any]] = {}
+        self._dirty = False
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                content = json.load(f)
+            if content.get("version") == _INDEX_FORMAT_VERSION:
+                self.entries = content["entries"]
+        except (OSError, ValueError, KeyError, AttributeError):
+            pass  # a missing or corrupt index is simply rebuilt
+
+    def lookup(self, key: str, fingerprint: List[Any]) -> Optional[str]:
+        """Retrieve the digest recorded for key if its fingerprint still matches."""
+        entry = self.entries.get(key)
+        if entry is not None and entry[:-1] == fingerprint:
+            return str(entry[-1])
+        return None
+
+    def record(self, key: str, fingerprint: List[Any], digest: str) -> None:
+        """Record a digest along with the fingerprint it was computed under."""
+        self.entries[key] = [*fingerprint, digest]
+        self._dirty = True
+
+    def save(self) -> None:
+        """Atomically persist the index if it changed."""
+        if not self._dirty:
+            return
+        write_json_atomic(
+            self.index_path, {"version": _INDEX_FORMAT_VERSION, "entries": self.entries}
+        )
+        self._dirty = False
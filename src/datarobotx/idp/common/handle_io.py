@@ -11,15 +11,75 @@
 # Released under the terms of DataRobot Tool and Utility Agreement.
 # https://www.datarobot.com/wp-content/uploads/2021/07/DataRobot-Tool-and-Utility-Agreement.pdf
 
-from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import contextlib
+import copy
+import functools
+import inspect
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar, Union
 
-from datarobotx.idp.common.hashing import get_hash
+from datarobotx.idp.common.hashing import get_digest, get_hash
 
 try:
-    from kedro.io import DataCatalog
+    from cachetools import Cache
+    from kedro.io import (
+        AbstractDataset,
+        AbstractVersionedDataset,
+        DataCatalog,
+        MemoryDataset,
+        Version,
+    )
+    from kedro.io.core import generate_timestamp, get_filepath_str
 except ImportError as e:
     raise ImportError("Consider including kedro in your project requirements`") from e
 
+try:
+    from kedro.io.warning_utils import suppress_catalog_warning
+except ImportError:  # kedro releases that do not deprecate DataCatalog yet
+    suppress_catalog_warning = contextlib.nullcontext  # type: ignore[misc,assignment]
+
+CATALOG_CACHE_SIZE = 32
+CHECKPOINT_MODES = ("content", "metadata")
+
+# fsspec info() fields that change when a file's contents do, across backends
+_FS_METADATA_KEYS = (
+    "ETag",
+    "etag",
+    "md5Hash",
+    "crc32c",
+    "checksum",
+    "mtime",
+    "LastModified",
+    "last_modified",
+    "updated",
+    "size",
+    "Size",
+    "ino",
+)
+
+_T = TypeVar("_T")
+_R = TypeVar("_R")
+
+# digest of resolved catalog, credentials and parameters -> template catalog
+_catalog_cache: "OrderedDict[str, DataCatalog]" = OrderedDict()
+_catalog_cache_lock = threading.Lock()
+_last_save_version = ""
+
+
+def clear_catalog_cache() -> None:
+    """Drop the DataCatalogs cached by functions decorated with `handle_io`.
+
+    Needed when something the catalog depends on changes without changing the
+    resolved catalog, credentials or parameters dicts, e.g. a custom dataset
+    class is reloaded.
+    """
+    with _catalog_cache_lock:
+        _catalog_cache.clear()
+
 
 def _resolve_dict(o: Union[None, Dict[str, Any], Callable[[], Dict[str, Any]]]) -> Dict[str, Any]:
     """Convert an optional callable that retrieves a dict into a materialized dict."""
@@ -31,36 +91,247 @@ def _resolve_dict(o: Union[None, Dict[str, Any], Callable[[], Dict[str, Any]]])
         return o()
 
 
+def _map_ordered(f: Callable[[_T], _R], items: List[_T], max_workers: Optional[int]) -> List[_R]:
+    """Apply f to items, concurrently if max_workers > 1.
+
+    Results keep the order of items. If calls fail, every call still runs to
+    completion and the exception of the earliest failing item is raised, so
+    errors do not depend on thread scheduling.
+    """
+    if max_workers is None or max_workers <= 1 or len(items) <= 1:
+        return [f(item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        futures = [executor.submit(f, item) for item in items]
+    return [future.result() for future in futures]
+
+
 def _persist_outputs(
-    rv: Any, outputs: Union[None, str, List[str], Dict[str, str]], catalog_obj: DataCatalog
+    rv: Any,
+    outputs: Union[None, str, List[str], Dict[str, str]],
+    catalog_obj: DataCatalog,
+    max_workers: Optional[int] = None,
 ) -> None:
     """Persist wrapped-function outputs."""
     if isinstance(outputs, str):
         catalog_obj.save(outputs, rv)
     elif isinstance(outputs, list):
-        for name, data in zip(outputs, rv):
-            catalog_obj.save(name, data)
+        _map_ordered(lambda item: catalog_obj.save(*item), list(zip(outputs, rv)), max_workers)
     elif isinstance(outputs, dict):
-        for name in outputs.keys():
-            catalog_obj.save(outputs[name], rv[name])
+        items = [(outputs[name], rv[name]) for name in outputs.keys()]
+        _map_ordered(lambda item: catalog_obj.save(*item), items, max_workers)
 
 
 def _build_inputs(
-    inputs: Union[None, str, List[str], Dict[str, str]], catalog_obj: DataCatalog
+    inputs: Union[None, str, List[str], Dict[str, str]],
+    catalog_obj: DataCatalog,
+    load: Optional[Callable[[str], Any]] = None,
+    max_workers: Optional[int] = None,
 ) -> Tuple[List[Any], Dict[str, Any]]:
-    """Build wrapped-function calling arguments."""
+    """Build wrapped-function calling arguments.
+
+    `load` retrieves each input by name; defaults to loading it from the catalog.
+    """
+    load = load if load is not None else catalog_obj.load
     if isinstance(inputs, str):
         return [
-            catalog_obj.load(inputs),
+            load(inputs),
         ], {}
     elif isinstance(inputs, list):
-        return [catalog_obj.load(input) for input in inputs], {}
+        return _map_ordered(load, inputs, max_workers), {}
     elif isinstance(inputs, dict):
-        return [], {k: catalog_obj.load(v) for k, v in inputs.items()}
+        values = _map_ordered(load, list(inputs.values()), max_workers)
+        return [], dict(zip(inputs.keys(), values))
     elif inputs is None:
         return [], {}
 
 
+def _fs_metadata(fs: Any, path: str) -> Any:
+    """Change-detecting metadata of a file, or of every file under a directory."""
+
+    def pick(info: Dict[str, Any]) -> Dict[str, str]:
+        return {k: str(info[k]) for k in _FS_METADATA_KEYS if k in info}
+
+    info = fs.info(path)
+    if info.get("type") == "directory":
+        # a directory's own mtime does not change when nested files are modified
+        files = fs.find(path, detail=True)
+        return [(name, pick(files[name])) for name in sorted(files)]
+    return pick(info)
+
+
+def dataset_fingerprint(
+    catalog_obj: DataCatalog, name: str, load: Optional[Callable[[str], Any]] = None
+) -> Any:
+    """Stand-in for a dataset's data that changes whenever the data does.
+
+    Filesystem-backed datasets are described by their type, configuration,
+    resolved load path (including the kedro version) and fsspec metadata,
+    without reading any data. The save version is left out since it changes
+    with every catalog build. In-memory datasets such as parameters are cheap
+    to load and contribute their values; any other dataset is loaded, with
+    `load` if given, e.g. to reuse data that was already loaded.
+    """
+    dataset = catalog_obj._get_dataset(name)  # resolves dataset factory patterns
+    # wrappers such as kedro's CachedDataset keep the wrapped dataset in _dataset
+    while isinstance(getattr(dataset, "_dataset", None), AbstractDataset):
+        dataset = getattr(dataset, "_dataset")
+    fs = getattr(dataset, "_fs", None)
+    if isinstance(dataset, MemoryDataset) or fs is None or not hasattr(dataset, "_filepath"):
+        return (load or catalog_obj.load)(name)
+    if isinstance(dataset, AbstractVersionedDataset):
+        raw_path = dataset._get_load_path()
+    else:
+        raw_path = dataset._filepath
+    path = get_filepath_str(raw_path, getattr(dataset, "_protocol", "file"))
+    description = {k: str(v) for k, v in dataset._describe().items() if k != "version"}
+    kind = f"{type(dataset).__module__}.{type(dataset).__qualname__}"
+    return [kind, description, path, _fs_metadata(fs, path)]
+
+
+def _new_save_version() -> str:
+    """Kedro save version later than any handed out before in this process.
+
+    Versions have millisecond resolution, so a call following another within
+    the same millisecond waits for the next one.
+    """
+    global _last_save_version
+    with _catalog_cache_lock:
+        version = generate_timestamp()
+        while version <= _last_save_version:
+            time.sleep(0.001)
+            version = generate_timestamp()
+        _last_save_version = version
+    return version
+
+
+def _is_reusable(catalog_dict: Dict[str, Any], catalog_obj: DataCatalog) -> bool:
+    """Whether `_checkout_catalog` can make copies of a catalog that behave like new builds.
+
+    Dataset factory patterns and versioned datasets inside wrappers such as
+    kedro's CachedDataset cannot be given a save version per copy, so such
+    catalogs are built for every call instead.
+    """
+    if any("{" in name for name in catalog_dict):  # as kedro detects patterns
+        return False
+    for dataset in catalog_obj._datasets.values():
+        inner = getattr(dataset, "_dataset", None)
+        while isinstance(inner, AbstractDataset):
+            if isinstance(inner, AbstractVersionedDataset) and inner._version:
+                return False
+            inner = getattr(inner, "_dataset", None)
+    return True
+
+
+def _checkout_catalog(template: DataCatalog) -> DataCatalog:
+    """Copy a cached catalog for a single call.
+
+    Datasets are shared with the template, so connections and fsspec
+    filesystem instances are reused; their caches (e.g. resolved versions) are
+    released. Memory datasets, including parameters, are copied so data saved
+    during one call is never visible to another. Versioned datasets are copied
+    with a new save version, as a catalog built from config for this call
+    would have.
+    """
+    # kedro 0.19 exposes no public accessor for the dataset objects
+    versioned = any(
+        isinstance(dataset, AbstractVersionedDataset) and dataset._version
+        for dataset in template._datasets.values()
+    )
+    save_version = _new_save_version() if versioned else None
+
+    datasets: Dict[str, Any] = {}
+    for name, dataset in template._datasets.items():
+        if isinstance(dataset, MemoryDataset):
+            dataset = copy.copy(dataset)
+        elif isinstance(dataset, AbstractVersionedDataset) and dataset._version:
+            versioned_copy = copy.copy(dataset)
+            versioned_copy._version = Version(dataset._version.load, save_version)
+            versioned_copy._version_cache = Cache(maxsize=2)
+            dataset = versioned_copy
+        else:
+            dataset.release()
+        datasets[name] = dataset
+
+    with suppress_catalog_warning():
+        return DataCatalog(datasets=datasets, save_version=save_version)
+
+
+def _build_catalog(
+    catalog: Union[Dict[str, Any], Callable[[], Dict[str, Any]]],
+    credentials: Union[None, Dict[str, Any], Callable[[], Dict[str, Any]]],
+    parameters: Union[None, Dict[str, Any], Callable[[], Dict[str, Any]]],
+    add_credentials_to_catalog: bool,
+    cache_catalog: bool,
+) -> DataCatalog:
+    """Materialize the catalog for a wrapped-function call, reusing a cached one if possible."""
+    catalog_dict = _resolve_dict(catalog)
+    credentials_dict = _resolve_dict(credentials)
+    parameters_dict = _resolve_dict(parameters) if parameters is not None else None
+    include_credentials = add_credentials_to_catalog and credentials is not None
+
+    key = None
+    if cache_catalog:
+        try:
+            key = get_digest(catalog_dict, credentials_dict, parameters_dict, include_credentials)
+        except (TypeError, OSError):
+            pass  # values that cannot be tokenized; build without caching
+    if key is not None:
+        with _catalog_cache_lock:
+            template = _catalog_cache.get(key)
+            if template is not None:
+                _catalog_cache.move_to_end(key)
+        if template is not None:
+            return _checkout_catalog(template)
+
+    catalog_obj = DataCatalog.from_config(catalog_dict, credentials=credentials_dict)
+    if parameters_dict is not None:
+        catalog_obj.add_feed_dict(
+            get_feed_dict(parameters_dict, copy_dict_as="parameters", key_prefix="params:")
+        )
+    if include_credentials:
+        catalog_obj.add_feed_dict(
+            get_feed_dict(credentials_dict, copy_dict_as=None, key_prefix="credentials:")
+        )
+    if key is None or not _is_reusable(catalog_dict, catalog_obj):
+        return catalog_obj
+
+    with _catalog_cache_lock:
+        _catalog_cache[key] = catalog_obj
+        while len(_catalog_cache) > CATALOG_CACHE_SIZE:
+            _catalog_cache.popitem(last=False)
+    return _checkout_catalog(catalog_obj)
+
+
+def _check_checkpoint(
+    f: Callable[..., Any],
+    inputs: Union[None, str, List[str], Dict[str, str]],
+    catalog_obj: DataCatalog,
+    checkpoint: str,
+    checkpoint_mode: str,
+    max_workers: Optional[int],
+) -> Tuple[bool, str, Optional[Tuple[List[Any], Dict[str, Any]]]]:
+    """Compare the checksum of a call with the one recorded in the checkpoint dataset.
+
+    Returns whether they match, the new checksum and, in 'content' mode, the
+    loaded inputs so that a miss does not load them a second time.
+    """
+    checksum = ""
+    loaded = None
+    try:
+        if checkpoint_mode == "metadata":
+            fingerprint = functools.partial(dataset_fingerprint, catalog_obj)
+            fp_args, fp_kwargs = _build_inputs(inputs, catalog_obj, fingerprint, max_workers)
+            checksum = get_hash(f, checkpoint_mode, *fp_args, **fp_kwargs)
+        else:
+            loaded = _build_inputs(inputs, catalog_obj, max_workers=max_workers)
+            checksum = get_hash(f, *loaded[0], **loaded[1])
+        prior_checksum = catalog_obj.load(checkpoint)
+        assert prior_checksum == checksum
+        return True, checksum, loaded
+    except Exception:
+        return False, checksum, loaded
+
+
 def get_feed_dict(
     d: Dict[str, Any], copy_dict_as: Optional[str], key_prefix: str = ""
 ) -> Dict[str, Any]:
@@ -92,6 +363,9 @@ def handle_io(
     credentials: Union[None, Dict[str, Any], Callable[[], Dict[str, Any]]] = None,
     parameters: Union[None, Dict[str, Any], Callable[[], Dict[str, Any]]] = None,
     add_credentials_to_catalog: bool = False,
+    cache_catalog: bool = True,
+    checkpoint_mode: str = "content",
+    max_workers: Optional[int] = None,
 ) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
     """Decorate a function with kedro-powered IO.
 
@@ -115,6 +389,21 @@ def handle_io(
     add_credentials_to_catalog : bool, default=False
         If true, credentials will be included in the catalog and resolvable
         as inputs to a node.
+    cache_catalog : bool, default=True
+        Reuse the DataCatalog built for earlier calls with identical resolved
+        catalog, credentials and parameters dicts instead of rebuilding it on
+        every call; see `clear_catalog_cache` for explicit invalidation.
+    checkpoint_mode : {'content', 'metadata'}, default='content'
+        How checkpoint checksums are derived from the inputs: 'content' loads
+        and hashes every input; 'metadata' hashes dataset configuration, kedro
+        versions and fsspec metadata (etag, mtime, size) of file-backed
+        inputs plus the values of parameters, so a checkpoint hit returns
+        without loading those inputs. Checksums of the two modes differ.
+    max_workers : int, optional
+        Load inputs and save outputs concurrently in a thread pool of this
+        size; arguments keep their order and, if several loads or saves fail,
+        the error of the first one in declaration order is raised. By default
+        datasets are loaded and saved one after another.
 
     Returns
     -------
@@ -131,6 +420,11 @@ def handle_io(
         if the checksum of the function inputs and sources matches the checksum
         in this dataset, the function execution will be skipped.
 
+        If the decorated function is a coroutine function, so is the returned
+        one: catalog construction, loads, saves and checksums run in worker
+        threads via `asyncio.to_thread` while the function itself is awaited,
+        so many decorated tasks can run concurrently in one event loop.
+
     Examples
     --------
     >>> my_catalog = {
@@ -146,6 +440,8 @@ def handle_io(
     ...     return f"{text} bar"
     >>> foo(inputs=["my_in_ds", "my_token"] , outputs="my_out_ds", checkpoint="checksum_ds")
     """
+    if checkpoint_mode not in CHECKPOINT_MODES:
+        raise ValueError(f"checkpoint_mode must be one of {CHECKPOINT_MODES}")
 
     def wrapper_factory(f: Callable[..., Any]) -> Callable[..., Any]:
         def wrapper(
@@ -153,39 +449,62 @@ def handle_io(
             outputs: Union[None, str, List[str], Dict[str, str]],
             checkpoint: Optional[str] = None,
         ) -> None:
-            catalog_obj = DataCatalog.from_config(
-                _resolve_dict(catalog), credentials=_resolve_dict(credentials)
+            catalog_obj = _build_catalog(
+                catalog, credentials, parameters, add_credentials_to_catalog, cache_catalog
             )
-            if parameters is not None:
-                catalog_obj.add_feed_dict(
-                    get_feed_dict(
-                        _resolve_dict(parameters), copy_dict_as="parameters", key_prefix="params:"
-                    )
-                )
-            if add_credentials_to_catalog and credentials is not None:
-                catalog_obj.add_feed_dict(
-                    get_feed_dict(
-                        _resolve_dict(credentials), copy_dict_as=None, key_prefix="credentials:"
-                    )
+            checksum = ""
+            loaded: Optional[Tuple[List[Any], Dict[str, Any]]] = None
+            if checkpoint is not None:
+                hit, checksum, loaded = _check_checkpoint(
+                    f, inputs, catalog_obj, checkpoint, checkpoint_mode, max_workers
                 )
-            f_args, f_kwargs = _build_inputs(inputs, catalog_obj)
+                if hit:
+                    return
+            f_args, f_kwargs = loaded or _build_inputs(inputs, catalog_obj, max_workers=max_workers)
+            rv = f(*f_args, **f_kwargs)
+            _persist_outputs(rv, outputs, catalog_obj, max_workers)
+            if checkpoint is not None:
+                catalog_obj.save(checkpoint, checksum)
 
+        async def async_wrapper(
+            inputs: Union[None, str, List[str], Dict[str, str]],
+            outputs: Union[None, str, List[str], Dict[str, str]],
+            checkpoint: Optional[str] = None,
+        ) -> None:
+            catalog_obj = await asyncio.to_thread(
+                _build_catalog,
+                catalog,
+                credentials,
+                parameters,
+                add_credentials_to_catalog,
+                cache_catalog,
+            )
+            checksum = ""
+            loaded: Optional[Tuple[List[Any], Dict[str, Any]]] = None
             if checkpoint is not None:
-                checksum = ""
-                try:
-                    checksum = get_hash(f, *f_args, **f_kwargs)
-                    prior_checksum = catalog_obj.load(checkpoint)
-                    assert prior_checksum == checksum
+                hit, checksum, loaded = await asyncio.to_thread(
+                    _check_checkpoint,
+                    f,
+                    inputs,
+                    catalog_obj,
+                    checkpoint,
+                    checkpoint_mode,
+                    max_workers,
+                )
+                if hit:
                     return
-                except Exception:
-                    pass
-                rv = f(*f_args, **f_kwargs)
-                _persist_outputs(rv, outputs, catalog_obj)
-                catalog_obj.save(checkpoint, checksum)
-            else:
-                rv = f(*f_args, **f_kwargs)
-                _persist_outputs(rv, outputs, catalog_obj)
+            if loaded is None:
+                loaded = await asyncio.to_thread(
+                    _build_inputs, inputs, catalog_obj, max_workers=max_workers
+                )
+            f_args, f_kwargs = loaded
+            rv = await f(*f_args, **f_kwargs)
+            await asyncio.to_thread(_persist_outputs, rv, outputs, catalog_obj, max_workers)
+            if checkpoint is not None:
+                await asyncio.to_thread(catalog_obj.save, checkpoint, checksum)
 
+        if inspect.iscoroutinefunction(f):
+            return async_wrapper
         return wrapper
 
     return wrapper_factory
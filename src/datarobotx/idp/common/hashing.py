@@ -11,26 +11,347 @@
 # Released under the terms of DataRobot Tool and Utility Agreement.
 # https://www.datarobot.com/wp-content/uploads/2021/07/DataRobot-Tool-and-Utility-Agreement.pdf
 
-"""Hashing utilities."""
+"""Hashing utilities.
 
+Tokens are produced by one of two engines:
+
+- ``"legacy"`` (default): the original chunk-chained scheme; returns bare
+  7 character hex tokens so assets created by earlier releases keep matching
+- ``"streaming"``: feeds a single incremental hasher per file with large buffered
+  reads and encodes nested arguments canonically (type tags, length prefixes,
+  sorted keys) in a single pass; returns versioned tokens (e.g. ``"s3-1a2b3c4"``)
+  that can never collide with legacy tokens
+
+Select the engine process-wide with ``set_hashing_options(engine="streaming")`` or
+for a block of code with ``with hashing_options(engine="streaming"): ...``.
+
+The ``algorithm`` option swaps sha256 for a faster digest (``"blake2b"``, or
+``"xxh3"`` when xxhash is installed). Legacy tokens are defined in terms of
+sha256, so any other algorithm implies the streaming engine; its tag is part of
+the token (e.g. ``"x3-1a2b3c4"``), so lookups never confuse tokens of
+different algorithms.
+
+Setting the ``fingerprint_cache`` option persists per-file digests keyed by
+(path, inode, size, mtime_ns) and, for large files, a digest of a few sampled
+blocks, so unchanged files are not re-read on later runs.
+Setting ``max_workers`` hashes the files of a directory concurrently with the
+streaming engine; tokens do not depend on the number of workers.
+
+DataFrames are hashed ``dataframe_chunk_rows`` rows at a time, which bounds the
+extra memory needed to a few arrays of that many uint64 values; tokens do not
+depend on the chunk size. With ``max_workers`` set, columns are hashed in parallel.
+
+Setting ``memo_max_bytes`` remembers the tokens of DataFrame and path arguments
+within the process, so pipelines passing the same large object to `get_hash`
+repeatedly only pay for it once.
+
+Setting ``callable_tokens="bytecode"`` tokenizes functions from their code
+objects instead of their source, which avoids reading source files and also
+captures changes to the helpers, constants and closures a function depends on.
+
+With ``columnar_fingerprints`` enabled, Parquet and Arrow IPC files are
+fingerprinted from their footer metadata (schema, row groups, row counts and
+column statistics) plus their size instead of being read in full.
+
+`get_hash_async` tokenizes in a worker thread (optionally hashing DataFrames in
+a process pool) so coroutines are not blocked while large arguments are hashed.
+
+Directory tokens leave out files excluded by an ignore file (``.dripignore``
+by default, see `datarobotx.idp.common.ignore`) at the root of the directory.
+
+Streaming directory tokens are the root of a Merkle tree; `build_manifest`
+exposes the per-file and per-directory digests of that tree and
+`diff_manifests` reports which files differ between two manifests.
+"""
+
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
 from datetime import date
-from hashlib import sha256
+import functools
+from hashlib import blake2b, sha256
 import inspect
+from io import BufferedIOBase
+import json
+import mmap
 import os
 from pathlib import Path
+import posixpath
 from struct import pack
-from typing import Any, Mapping, Sequence
+import sysconfig
+import threading
+from types import CodeType, FunctionType
+from typing import (
+    AbstractSet,
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Protocol,
+    Sequence,
+    Set,
+    Tuple,
+    TypeVar,
+    Union,
+)
+import weakref
 
+import numpy as np
 import pandas as pd
 from pandas.util import hash_pandas_object
 
 from datarobot.models.api_object import APIObject
 
+from datarobotx.idp.common.fingerprint_cache import (
+    FingerprintIndex,
+    default_cache_dir,
+    fingerprint,
+    is_racy,
+    stat_key,
+    write_json_atomic,
+)
+from datarobotx.idp.common.ignore import (
+    DEFAULT_IGNORE_FILE,
+    IgnoreRules,
+    load_ignore_rules,
+    walk,
+)
+
 HASHING_ALGORITHM = sha256
 CHECKSUM_FILE_EXTENSION = ".sha256"
 TRUNCATE_HASH_TO = 7
+TOKEN_VERSION = 3
+READ_BUFFER_SIZE = 1024 * 1024
+BLAKE2B_DIGEST_SIZE = 16
 
 _NONE_REPRESENTATION = 0xFCA86420
+_LEGACY_CHUNK_SIZE = 8192
+_PARQUET_MAGIC = b"PAR1"
+_ARROW_MAGIC = b"ARROW1"
+_ENGINES = ("legacy", "streaming")
+_CALLABLE_TOKENS = ("source", "bytecode")
+
+_T = TypeVar("_T")
+_R = TypeVar("_R")
+
+
+class _Hasher(Protocol):
+    def update(self, data: Union[bytes, bytearray, memoryview], /) -> None:
+        ...
+
+    def digest(self) -> bytes:
+        ...
+
+    def hexdigest(self) -> str:
+        ...
+
+
+# name -> (token tag, hasher factory)
+_algorithms: Dict[str, Tuple[str, Callable[[], _Hasher]]] = {
+    "sha256": ("s", sha256),
+    "blake2b": ("b", functools.partial(blake2b, digest_size=BLAKE2B_DIGEST_SIZE)),
+}
+try:
+    from xxhash import xxh3_128
+
+    _algorithms["xxh3"] = ("x", xxh3_128)
+except ImportError:
+    pass
+
+_default_options: Dict[str, Any] = {
+    "engine": "legacy",
+    "algorithm": "sha256",
+    "fingerprint_cache": None,
+    "max_workers": None,
+    "dataframe_chunk_rows": 1_000_000,
+    "columnar_fingerprints": False,
+    "memo_max_bytes": 0,
+    "callable_tokens": "source",
+    "dataframe_processes": None,
+    "mmap_threshold": 64 * 1024 * 1024,
+    "ignore_file": DEFAULT_IGNORE_FILE,
+}
+_scoped_options: ContextVar[Dict[str, Any]] = ContextVar("_scoped_options")
+
+
+def _validate_options(options: Mapping[str, Any]) -> None:
+    for name, value in options.items():
+        if name not in _default_options:
+            raise ValueError(f"Unknown hashing option '{name}'")
+        if name == "engine" and value not in _ENGINES:
+            raise ValueError(f"Hashing engine must be one of {_ENGINES}, got '{value}'")
+        if name == "algorithm" and value not in _algorithms:
+            if value == "xxh3":
+                raise ImportError("Consider including xxhash in your project requirements")
+            raise ValueError(f"Hashing algorithm must be one of {list(_algorithms)}")
+        if name == "fingerprint_cache" and not isinstance(value, (type(None), bool, str, Path)):
+            raise ValueError("fingerprint_cache must be None, a bool or a directory path")
+        if name == "max_workers" and not (value is None or (isinstance(value, int) and value > 0)):
+            raise ValueError("max_workers must be None or a positive int")
+        if name == "columnar_fingerprints" and not isinstance(value, bool):
+            raise ValueError("columnar_fingerprints must be a bool")
+        if name == "dataframe_chunk_rows" and not (isinstance(value, int) and value > 0):
+            raise ValueError("dataframe_chunk_rows must be a positive int")
+        if name == "memo_max_bytes" and not (isinstance(value, int) and value >= 0):
+            raise ValueError("memo_max_bytes must be a non-negative int")
+        if name == "dataframe_processes" and not (
+            value is None or (isinstance(value, int) and value > 0)
+        ):
+            raise ValueError("dataframe_processes must be None or a positive int")
+        if name == "mmap_threshold" and not (
+            value is None or (isinstance(value, int) and value > 0)
+        ):
+            raise ValueError("mmap_threshold must be None or a positive int")
+        if name == "ignore_file" and not (value is None or isinstance(value, str)):
+            raise ValueError("ignore_file must be None or a file name")
+        if name == "callable_tokens" and value not in _CALLABLE_TOKENS:
+            raise ValueError(f"callable_tokens must be one of {_CALLABLE_TOKENS}")
+
+
+def set_hashing_options(**options: Any) -> None:
+    """Set hashing options for the whole process.
+
+    Parameters
+    ----------
+    engine : {'legacy', 'streaming'}, optional
+        Tokenization engine; see module docstring for details
+    algorithm : str, optional
+        Digest algorithm: 'sha256' (default), 'blake2b', 'xxh3' (requires
+        xxhash) or any name added with `register_hashing_algorithm`
+    fingerprint_cache : bool or path-like, optional
+        Persist file digests so unchanged files skip I/O on later runs;
+        True stores indexes under `fingerprint_cache.default_cache_dir()`,
+        a path stores them in that directory; disabled by default
+    max_workers : int, optional
+        Size of the thread pool used to hash the files of a directory
+        concurrently (hashlib releases the GIL while digesting); only applies
+        to the streaming engine since the legacy chain is inherently sequential;
+        also used to hash DataFrame columns concurrently
+    dataframe_chunk_rows : int, optional
+        Number of DataFrame rows hashed at a time; default 1,000,000
+    columnar_fingerprints : bool, optional
+        Fingerprint Parquet and Arrow IPC files from their footers rather than
+        their full contents; implies the streaming engine. Rewriting a file with
+        different values but identical footer metadata is not detected.
+    memo_max_bytes : int, optional
+        Remember the tokens of DataFrame and path arguments in memory so that
+        hashing the same object again is free; the total size of the remembered
+        arguments is bounded by this many bytes, least recently used first out.
+        Disabled (0) by default. See `clear_hash_memo`.
+    callable_tokens : {'source', 'bytecode'}, optional
+        How functions are tokenized: from their source text (default) or from
+        their compiled code together with the module-level helper functions
+        and constants they reference, closure cell values and argument
+        defaults. Bytecode tokens ignore formatting, comments and line numbers
+        but differ between Python minor versions.
+    dataframe_processes : int, optional
+        Size of a process pool in which `get_hash_async` tokenizes DataFrame
+        arguments; by default they are hashed in a worker thread like any other
+        argument. Frames are pickled to the worker processes, so this only
+        pays off for frames that are expensive to hash relative to their size.
+    mmap_threshold : int, optional
+        Files of at least this many bytes are hashed from a read-only memory
+        mapping rather than buffered reads; default 64 MiB, None disables it.
+        Files that cannot be mapped fall back to buffered reads.
+    ignore_file : str, optional
+        Name of the ignore file honoured when hashing a directory: entries of
+        the directory matching its .gitignore-style patterns are left out of
+        the token. Default '.dripignore'; None hashes every file.
+    """
+    _validate_options(options)
+    _default_options.update(options)
+
+
+@contextmanager
+def hashing_options(**options: Any) -> Iterator[None]:
+    """Override hashing options within a block of code.
+
+    Overrides are tracked with a context variable, so they are visible to
+    coroutines and ``asyncio.to_thread`` calls made inside the block but do not
+    leak into other threads. Accepts the same options as `set_hashing_options`.
+    """
+    _validate_options(options)
+    reset_token = _scoped_options.set({**_scoped_options.get({}), **options})
+    try:
+        yield
+    finally:
+        _scoped_options.reset(reset_token)
+
+
+def get_hashing_option(name: str) -> Any:
+    """Retrieve the hashing option currently in effect."""
+    return _scoped_options.get({}).get(name, _default_options[name])
+
+
+def register_hashing_algorithm(name: str, tag: str, factory: Callable[[], _Hasher]) -> None:
+    """Make an additional digest algorithm available to the ``algorithm`` option.
+
+    Parameters
+    ----------
+    name : str
+        Name used to select the algorithm
+    tag : str
+        Single lowercase letter identifying the algorithm in tokens
+    factory : callable
+        Returns a new hashlib-style object providing ``update()``,
+        ``digest()`` and ``hexdigest()``
+    """
+    if len(tag) != 1 or not tag.islower():
+        raise ValueError("Algorithm tags must be a single lowercase letter")
+    if any(t == tag for n, (t, _) in _algorithms.items() if n != name):
+        raise ValueError(f"Algorithm tag '{tag}' is already in use")
+    _algorithms[name] = (tag, factory)
+
+
+def _new_hasher(algorithm: str) -> _Hasher:
+    return _algorithms[algorithm][1]()
+
+
+def _current_engine_and_algorithm() -> Tuple[str, str]:
+    algorithm = get_hashing_option("algorithm")
+    if algorithm != "sha256" or get_hashing_option("columnar_fingerprints"):
+        return "streaming", algorithm
+    return get_hashing_option("engine"), algorithm
+
+
+def _map(f: Callable[[_T], _R], items: List[_T], max_workers: Optional[int]) -> List[_R]:
+    """Apply f to items in order, optionally in a thread pool.
+
+    Pool threads run f in a copy of the caller's context so scoped hashing
+    options stay in effect.
+    """
+    if max_workers is None or max_workers <= 1 or len(items) <= 1:
+        return [f(item) for item in items]
+    context = copy_context()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # map() yields in submission order regardless of completion order
+        return list(executor.map(lambda item: context.copy().run(f, item), items))
+
+
+def parse_token(token: str) -> Tuple[str, int, str]:
+    """Split a token into its algorithm, token version and digest.
+
+    Legacy (unversioned) tokens are reported as version 1.
+
+    Raises
+    ------
+    ValueError
+        If the token was not produced by `get_hash`
+    """
+    if len(token) == TRUNCATE_HASH_TO and all(c in "0123456789abcdef" for c in token):
+        return "sha256", 1, token
+    tag, _, digest = token.partition("-")
+    algorithms = {tag: name for name, (tag, _) in _algorithms.items()}
+    if tag[:1] in algorithms and tag[1:].isdigit() and len(digest):
+        return algorithms[tag[:1]], int(tag[1:]), digest
+    raise ValueError(f"Unrecognized token '{token}'")
 
 
 def int_to_bytes(number: int) -> bytes:
@@ -43,11 +364,873 @@ def int_to_bytes(number: int) -> bytes:
     )
 
 
+def _iter_chunks(f: BufferedIOBase, chunk_size: int) -> Iterator[memoryview]:
+    """Yield fixed-size chunks of a file using large buffered reads.
+
+    Yielded views share a buffer and are only valid until the next iteration.
+    """
+    buffer = bytearray(READ_BUFFER_SIZE - READ_BUFFER_SIZE % chunk_size)
+    view = memoryview(buffer)
+    while n_read := f.readinto(buffer):
+        for offset in range(0, n_read, chunk_size):
+            yield view[offset : min(offset + chunk_size, n_read)]
+
+
+def _iter_file_chunks(f: BufferedIOBase, chunk_size: int) -> Iterator[memoryview]:
+    """Iterate over chunk_size views of a file, memory-mapping it if it is large.
+
+    Mapped files are fed to the hasher without any copy or read syscall;
+    yielded views are released as soon as the consumer moves on.
+    """
+    threshold = get_hashing_option("mmap_threshold")
+    if threshold is not None and os.fstat(f.fileno()).st_size >= threshold:
+        try:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            pass  # e.g. filesystems without mmap support
+        else:
+            with mapping:
+                if hasattr(mapping, "madvise"):
+                    mapping.madvise(mmap.MADV_SEQUENTIAL)
+                with memoryview(mapping) as view:
+                    for offset in range(0, len(view), chunk_size):
+                        with view[offset : offset + chunk_size] as chunk:
+                            yield chunk
+            return
+    yield from _iter_chunks(f, chunk_size)
+
+
+def _legacy_chain(path: str, state: str = "") -> str:
+    """Chain a file's 8 KiB chunks into a legacy token.
+
+    Equivalent to ``state = get_hash(chunk, state)`` for each chunk, without the
+    per-chunk dispatch overhead.
+    """
+    with open(path, "rb") as f:
+        for chunk in _iter_file_chunks(f, _LEGACY_CHUNK_SIZE):
+            hasher = HASHING_ALGORITHM(chunk)
+            hasher.update(state.encode("utf-8"))
+            state = hasher.hexdigest()[:TRUNCATE_HASH_TO]
+    return state
+
+
+def _file_digest(path: str, algorithm: str = "sha256") -> bytes:
+    """Full-length digest of a file's contents, computed in a single pass."""
+    hasher = _new_hasher(algorithm)
+    with open(path, "rb") as f:
+        for chunk in _iter_file_chunks(f, READ_BUFFER_SIZE):
+            hasher.update(chunk)
+    return hasher.digest()
+
+
+def _ignore_rules(base_path: Path) -> Optional[IgnoreRules]:
+    return load_ignore_rules(base_path, get_hashing_option("ignore_file"))
+
+
+def _list_tree(base_path: Path) -> Tuple[List[str], List[str]]:
+    """List relative posix paths of all directories and files under a directory.
+
+    Both lists follow the deterministic (sorted, top-down) walk order and leave
+    out entries excluded by the directory's ignore file.
+    """
+    dir_paths: List[str] = []
+    file_paths: List[str] = []
+    base = os.fspath(base_path)
+    for root, dirs, files in walk(base, _ignore_rules(base_path)):
+        dirs.sort()  # force deterministic traversal
+        # plain string handling; pathlib dominates the cost of walking large trees
+        rel_root = os.path.relpath(root, base).replace(os.sep, "/")
+        prefix = f"{rel_root}/" if rel_root != "." else ""
+        dir_paths.extend(prefix + name for name in dirs)
+        file_paths.extend(prefix + name for name in sorted(files))
+    return dir_paths, file_paths
+
+
+def _tree_digests(
+    dir_paths: List[str], file_digests: Mapping[str, bytes], algorithm: str
+) -> Dict[str, bytes]:
+    """Combine per-file digests into Merkle-style directory digests.
+
+    Each directory digests the (kind, name, digest) records of its direct
+    children, so the root digest (at ``""``) covers names, structure and contents.
+    """
+    children: Dict[str, List[Tuple[bytes, str, bytes]]] = {"": []}
+    for dir_path in dir_paths:
+        children[dir_path] = []
+    for file_path, digest in file_digests.items():
+        children[posixpath.dirname(file_path)].append((b"f", file_path, digest))
+    dir_digests = {}
+    for dir_path in sorted(dir_paths, key=lambda p: p.count("/"), reverse=True):
+        dir_digests[dir_path] = _node_digest(children[dir_path], algorithm)
+        children[posixpath.dirname(dir_path)].append((b"d", dir_path, dir_digests[dir_path]))
+    dir_digests[""] = _node_digest(children[""], algorithm)
+    return dir_digests
+
+
+def _node_digest(entries: List[Tuple[bytes, str, bytes]], algorithm: str) -> bytes:
+    hasher = _new_hasher(algorithm)
+    for kind, path, digest in sorted(entries, key=lambda e: posixpath.basename(e[1])):
+        name = posixpath.basename(path).encode("utf-8")
+        hasher.update(kind + int_to_bytes(len(name)) + name + digest)
+    return hasher.digest()
+
+
+def _cache_dir() -> Optional[Path]:
+    location = get_hashing_option("fingerprint_cache")
+    if location is None or location is False:
+        return None
+    return default_cache_dir() if location is True else Path(location)
+
+
+def _cache_file_name(key: str) -> str:
+    return sha256(key.encode("utf-8")).hexdigest()[:16]
+
+
+@contextmanager
+def _fingerprint_index(root_path: Path) -> Iterator[Optional[FingerprintIndex]]:
+    """Open the fingerprint index for a root path, if caching is enabled."""
+    cache_dir = _cache_dir()
+    if cache_dir is None:
+        yield None
+        return
+    index_name = _cache_file_name(str(root_path.resolve()))
+    index = FingerprintIndex(cache_dir / f"{index_name}{CHECKSUM_FILE_EXTENSION}")
+    yield index
+    try:
+        index.save()
+    except OSError:
+        pass  # caching is best-effort
+
+
+def _indexed(
+    index: Optional[FingerprintIndex],
+    key: str,
+    path: str,
+    compute: Callable[[str], str],
+    st: Optional[os.stat_result] = None,
+    tier1: Optional[List[Any]] = None,
+) -> str:
+    """Compute a file digest, reusing the indexed value while the file is unchanged."""
+    if index is None:
+        return compute(path)
+    st = st if st is not None else os.stat(path)
+    tier1 = tier1 if tier1 is not None else fingerprint(path, st)
+    digest = index.lookup(key, tier1)
+    if digest is None:
+        digest = compute(path)
+        if not is_racy(st):
+            index.record(key, tier1, digest)
+    return digest
+
+
+def _footer_digest(path: str, algorithm: str) -> Optional[bytes]:
+    """Digest the footer metadata of a Parquet or Arrow IPC file.
+
+    Returns None if the file is not in either format.
+    """
+    with open(path, "rb") as f:
+        head = f.read(len(_ARROW_MAGIC))
+        size = f.seek(0, os.SEEK_END)
+        if size < 2 * len(_ARROW_MAGIC) + 4:
+            return None
+        f.seek(size - len(_ARROW_MAGIC) - 4)
+        tail = f.read()
+        # both formats end with <footer><int32 footer length><magic>
+        if head.startswith(_PARQUET_MAGIC) and tail.endswith(_PARQUET_MAGIC):
+            kind, magic, data_start = b"parquet", _PARQUET_MAGIC, len(_PARQUET_MAGIC)
+        elif head == _ARROW_MAGIC and tail.endswith(_ARROW_MAGIC):
+            kind, magic, data_start = b"arrow", _ARROW_MAGIC, 8  # leading magic is padded
+        else:
+            return None
+        footer_end = size - len(magic) - 4
+        length_bytes = tail[-len(magic) - 4 : -len(magic)]
+        footer_length = int.from_bytes(length_bytes, "little", signed=True)
+        if not 0 < footer_length <= footer_end - data_start:
+            return None
+        f.seek(footer_end - footer_length)
+        footer = f.read(footer_length)
+    hasher = _new_hasher(algorithm)
+    hasher.update(kind + int_to_bytes(size) + footer)
+    return hasher.digest()
+
+
+def _file_hexdigest(path: str, algorithm: str, columnar: bool = False) -> str:
+    digest = _footer_digest(path, algorithm) if columnar else None
+    return (digest if digest is not None else _file_digest(path, algorithm)).hex()
+
+
+def _current_file_digest() -> Tuple[str, Callable[[str], str]]:
+    """Name and implementation of the per-file digest currently in effect."""
+    algorithm = get_hashing_option("algorithm")
+    columnar = get_hashing_option("columnar_fingerprints")
+    compute = functools.partial(_file_hexdigest, algorithm=algorithm, columnar=columnar)
+    return f"{algorithm}+columnar" if columnar else algorithm, compute
+
+
+class DirectoryManifest(NamedTuple):
+    """Merkle tree of a directory's contents.
+
+    Paths are relative posix paths, with the directory itself at ``""``;
+    digests are hex encoded; `algorithm` names the per-file digest used,
+    e.g. ``"sha256"`` or ``"sha256+columnar"``. Manifests round-trip through JSON via
+    ``DirectoryManifest(**json.loads(json.dumps(manifest._asdict())))``.
+    """
+
+    algorithm: str
+    files: Dict[str, str]
+    dirs: Dict[str, str]
+    stats: Dict[str, List[Any]]
+
+    @property
+    def root(self) -> str:
+        """Digest of the whole directory."""
+        return self.dirs[""]
+
+
+class ManifestDiff(NamedTuple):
+    """Files that differ between two directory manifests."""
+
+    added: List[str]
+    removed: List[str]
+    modified: List[str]
+
+    def summary(self) -> str:
+        """Describe the changes in a single human-readable line."""
+        parts = [
+            f"{label}: {', '.join(paths)}"
+            for label, paths in zip(("added", "removed", "modified"), self)
+            if len(paths)
+        ]
+        return "; ".join(parts) if len(parts) else "no file changes"
+
+
+def build_manifest(path: Path, previous: Optional[DirectoryManifest] = None) -> DirectoryManifest:
+    """Build a Merkle manifest of a directory.
+
+    Parameters
+    ----------
+    path : Path
+        Directory to describe
+    previous : DirectoryManifest, optional
+        Earlier manifest of the same directory; files whose fingerprint (inode,
+        size, mtime and, for large files, sampled blocks) is unchanged since it
+        was built reuse its digests instead of being re-read, so only dirty
+        subtrees are re-hashed
+
+    Returns
+    -------
+    DirectoryManifest
+        Manifest whose root digest underlies the streaming engine's token
+        for `path`
+    """
+    base = os.fspath(path)
+    algorithm = get_hashing_option("algorithm")
+    digest_kind, compute = _current_file_digest()
+    if previous is not None and previous.algorithm != digest_kind:
+        previous = None
+    dir_paths, file_paths = _list_tree(path)
+    stats = {p: os.stat(os.path.join(base, p)) for p in file_paths}
+    fingerprints = {p: fingerprint(os.path.join(base, p), st) for p, st in stats.items()}
+
+    with _fingerprint_index(path) as index:
+
+        def digest(p: str) -> str:
+            if previous is not None and previous.stats.get(p) == fingerprints[p]:
+                return previous.files[p]
+            key = f"{digest_kind}:{p}"
+            return _indexed(index, key, os.path.join(base, p), compute, stats[p], fingerprints[p])
+
+        # digests come back in the sorted walk order, whatever the number of workers
+        digests = _map(digest, file_paths, get_hashing_option("max_workers"))
+        file_digests = dict(zip(file_paths, digests))
+
+    dir_digests = _tree_digests(
+        dir_paths, {p: bytes.fromhex(digest) for p, digest in file_digests.items()}, algorithm
+    )
+    return DirectoryManifest(
+        algorithm=digest_kind,
+        files=file_digests,
+        dirs={p: digest.hex() for p, digest in dir_digests.items()},
+        # racy files get an empty fingerprint so they are always re-read next time
+        stats={p: [] if is_racy(st) else fingerprints[p] for p, st in stats.items()},
+    )
+
+
+def diff_manifests(old: DirectoryManifest, new: DirectoryManifest) -> ManifestDiff:
+    """List the files added, removed and modified between two manifests.
+
+    Subtrees whose directory digests match are skipped without comparing
+    their individual files.
+    """
+    if old.algorithm != new.algorithm:
+        raise ValueError("Cannot compare manifests built with different hashing algorithms")
+    unchanged_dirs = {p for p, digest in new.dirs.items() if old.dirs.get(p) == digest}
+
+    def changed(p: str) -> bool:
+        parent = posixpath.dirname(p)
+        while parent not in unchanged_dirs:
+            if not len(parent):
+                return True
+            parent = posixpath.dirname(parent)
+        return False
+
+    return ManifestDiff(
+        added=sorted(p for p in new.files if p not in old.files and changed(p)),
+        removed=sorted(p for p in old.files if p not in new.files),
+        modified=sorted(
+            p for p in new.files if p in old.files and changed(p) and old.files[p] != new.files[p]
+        ),
+    )
+
+
+def record_manifest(key: str, path: Path) -> Optional[ManifestDiff]:
+    """Record the manifest of a directory and report changes since the last one.
+
+    Manifests are stored next to the fingerprint indexes, so this is a no-op
+    unless the ``fingerprint_cache`` option is enabled.
+
+    Parameters
+    ----------
+    key : str
+        Identifies the series of manifests to compare against, e.g. the
+        asset a directory is uploaded to
+    path : Path
+        Directory to describe
+
+    Returns
+    -------
+    ManifestDiff or None
+        Changes since the manifest last recorded under `key`; None if
+        caching is disabled or nothing was recorded before
+    """
+    cache_dir = _cache_dir()
+    if cache_dir is None:
+        return None
+    manifest_path = cache_dir / "manifests" / f"{_cache_file_name(key)}.json"
+    previous = None
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            previous = DirectoryManifest(**json.load(f))
+    except (OSError, ValueError, TypeError):
+        pass
+    manifest = build_manifest(path, previous)
+    try:
+        write_json_atomic(manifest_path, manifest._asdict())
+    except OSError:
+        pass  # caching is best-effort
+    if previous is None or previous.algorithm != manifest.algorithm:
+        return None
+    return diff_manifests(previous, manifest)
+
+
+def _legacy_tree_token(base_path: Path) -> str:
+    token = ""
+    for root, dirs, files in walk(base_path, _ignore_rules(base_path)):
+        dirs.sort()  # force deterministic traversal
+        token = get_hash(str(Path(root).relative_to(base_path)), *dirs, *files, token)
+        for filename in sorted(files):
+            token = _legacy_chain(os.path.join(root, filename), token)
+    return token
+
+
+def _hash_file_arg(path: Path, engine: str) -> bytes:
+    with _fingerprint_index(path) as index:
+        if engine == "streaming":
+            digest_kind, compute = _current_file_digest()
+            digest = _indexed(index, f"{digest_kind}:.", str(path), compute)
+            return b"file" + bytes.fromhex(digest)
+        return _indexed(index, "legacy:.", str(path), _legacy_chain).encode("utf-8")
+
+
+def _hash_dir_arg(base_path: Path, engine: str) -> bytes:
+    if engine == "streaming":
+        return b"dir" + bytes.fromhex(build_manifest(base_path).root)
+
+    base = os.fspath(base_path)
+    with _fingerprint_index(base_path) as index:
+        dir_paths, file_paths = _list_tree(base_path)
+        if index is None:
+            return _legacy_tree_token(base_path).encode("utf-8")
+
+        # the legacy chain runs across files, so only the whole tree can be reused
+        stats = [os.stat(os.path.join(base, p)) for p in file_paths]
+        fingerprints = [fingerprint(os.path.join(base, p), st) for p, st in zip(file_paths, stats)]
+        tree_stats = repr((dir_paths, file_paths, fingerprints))
+        signature = [HASHING_ALGORITHM(tree_stats.encode("utf-8")).hexdigest()]
+        token = index.lookup("legacy-tree:.", signature)
+        if token is None:
+            token = _legacy_tree_token(base_path)
+            if not any(is_racy(st) for st in stats):
+                index.record("legacy-tree:.", signature, token)
+        return token.encode("utf-8")
+
+
+def _combine_hash_arrays(
+    arrays: Iterator["np.ndarray[Any, Any]"], num_items: int, out: Any
+) -> None:
+    """Fold per-column hashes into per-row hashes in place.
+
+    Mirrors the combination used by `pandas.util.hash_pandas_object` (itself
+    CPython's tuple hash), but consumes the arrays one at a time so only one
+    column's hashes need to be held in memory.
+    """
+    mult = np.uint64(1000003)
+    out[:] = np.uint64(0x345678)
+    for i, a in enumerate(arrays):
+        inverse_i = num_items - i
+        out ^= a
+        out *= mult
+        mult += np.uint64(82520 + inverse_i + inverse_i)
+    out += np.uint64(97531)
+
+
+def _row_hashes(df: pd.DataFrame, max_workers: Optional[int]) -> "np.ndarray[Any, Any]":
+    """Equivalent to ``hash_pandas_object(df).to_numpy()``, computed column-wise."""
+
+    def hash_column(i: int) -> "np.ndarray[Any, Any]":
+        return hash_pandas_object(df.iloc[:, i], index=False).to_numpy()
+
+    def column_hashes() -> Iterator["np.ndarray[Any, Any]"]:
+        batch_size = max_workers if max_workers is not None else 1
+        for start in range(0, len(df.columns), batch_size):
+            batch = list(range(start, min(start + batch_size, len(df.columns))))
+            yield from _map(hash_column, batch, max_workers)
+        yield hash_pandas_object(df.index).to_numpy()
+
+    out = np.empty(len(df), dtype=np.uint64)
+    _combine_hash_arrays(column_hashes(), len(df.columns) + 1, out)
+    return out
+
+
+def _hash_data_frame(df: pd.DataFrame, engine: str, algorithm: str, full: bool = False) -> str:
+    """Tokenize a DataFrame in row chunks.
+
+    Row hashes are independent of each other, so feeding them to the hasher
+    chunk by chunk yields the same token as hashing the whole frame at once.
+    With `full`, the untruncated hex digest is returned instead of a token.
+    """
+    chunk_rows = get_hashing_option("dataframe_chunk_rows")
+    max_workers = get_hashing_option("max_workers")
+    hasher = _new_hasher(algorithm)
+    hasher.update(hash_pandas_object(df.columns).to_numpy().data)
+    hasher.update(hash_pandas_object(df.dtypes).to_numpy().data)
+    for start in range(0, len(df), chunk_rows):
+        hasher.update(hash_pandas_object(df.index[start : start + chunk_rows]).to_numpy().data)
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start : start + chunk_rows]
+        hasher.update(_row_hashes(chunk, max_workers).data)
+    if full:
+        return hasher.hexdigest()
+    return _finalize(hasher.hexdigest(), engine, algorithm)
+
+
+def _hash_array(arr: "np.ndarray[Any, Any]", engine: str, algorithm: str) -> str:
+    """Tokenize a numpy array from its dtype, shape and raw buffer.
+
+    The buffer is passed to the hasher as a view; only arrays that are not
+    C-contiguous are copied first.
+    """
+    if arr.dtype.hasobject:
+        return get_hash("object", list(arr.shape), arr.tolist())
+    hasher = _new_hasher(algorithm)
+    hasher.update(repr((arr.dtype.descr, arr.shape)).encode("utf-8"))
+    hasher.update(np.ascontiguousarray(arr).reshape(-1).view(np.uint8).data)
+    return _finalize(hasher.hexdigest(), engine, algorithm)
+
+
+@functools.lru_cache(maxsize=None)
+def _is_library_file(filename: str) -> bool:
+    """Whether code was loaded from the standard library or an installed package."""
+    if filename.startswith("<frozen "):
+        return True
+    paths = sysconfig.get_paths()
+    filename = os.path.realpath(filename)
+    return any(
+        filename.startswith(os.path.join(os.path.realpath(paths[name]), ""))
+        for name in ("stdlib", "platstdlib", "purelib", "platlib")
+    )
+
+
+def _const_bytes(const: Any) -> bytes:
+    if isinstance(const, CodeType):
+        return b"code" + _code_fingerprint(const)[0]
+    if isinstance(const, tuple):
+        return b"(" + b",".join(_const_bytes(c) for c in const) + b")"
+    if isinstance(const, frozenset):
+        # member order of frozensets of str varies with hash randomization
+        return b"{" + b",".join(sorted(_const_bytes(c) for c in const)) + b"}"
+    return repr(const).encode("utf-8")
+
+
+_code_fingerprints: "weakref.WeakKeyDictionary[CodeType, Tuple[bytes, Tuple[str, ...]]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _code_fingerprint(code: CodeType) -> Tuple[bytes, Tuple[str, ...]]:
+    """Digest of a code object and the names it and its nested code objects load.
+
+    File names and line numbers are left out, so moving a function does not
+    change its digest. Results are cached per code object.
+    """
+    cached = _code_fingerprints.get(code)
+    if cached is not None:
+        return cached
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, CodeType):
+            names.update(_code_fingerprint(const)[1])
+    hasher = sha256()
+    for field in (
+        code.co_code,
+        repr(
+            (
+                code.co_argcount,
+                code.co_posonlyargcount,
+                code.co_kwonlyargcount,
+                code.co_flags,
+                code.co_names,
+                code.co_varnames,
+                code.co_freevars,
+                code.co_cellvars,
+            )
+        ).encode("utf-8"),
+        _const_bytes(code.co_consts),
+    ):
+        hasher.update(int_to_bytes(len(field)))
+        hasher.update(field)
+    result = hasher.digest(), tuple(sorted(names))
+    _code_fingerprints[code] = result
+    return result
+
+
+def _dependency_bytes(value: Any, seen: Set[int]) -> bytes:
+    """Encode a closure cell value or argument default of a function."""
+    if isinstance(value, FunctionType) and not _is_library_file(value.__code__.co_filename):
+        if id(value) in seen:
+            return b"recursive"
+        return _function_digest(value, seen)
+    try:
+        return get_hash(value).encode("utf-8")
+    except (TypeError, OSError):
+        # untokenizable values (loggers, clients, ...) only contribute their type
+        return f"{type(value).__module__}.{type(value).__qualname__}".encode("utf-8")
+
+
+def _function_digest(func: FunctionType, seen: Set[int]) -> bytes:
+    """Digest of a function's code and of the globals, closures and defaults it uses."""
+    seen.add(id(func))
+    code_digest, names = _code_fingerprint(func.__code__)
+    hasher = sha256(code_digest)
+    for name in names:
+        value = func.__globals__.get(name)
+        if isinstance(value, FunctionType) and not _is_library_file(value.__code__.co_filename):
+            hasher.update(name.encode("utf-8") + _dependency_bytes(value, seen))
+        elif isinstance(value, (bool, int, float, str, bytes)):
+            hasher.update(name.encode("utf-8") + get_hash(value).encode("utf-8"))
+    for cell in func.__closure__ or ():
+        try:
+            hasher.update(_dependency_bytes(cell.cell_contents, seen))
+        except ValueError:
+            hasher.update(b"empty")  # cell not yet assigned
+    for default in (*(func.__defaults__ or ()), *(func.__kwdefaults__ or {}).items()):
+        hasher.update(_dependency_bytes(default, seen))
+    return hasher.digest()
+
+
+def _hash_callable(func: Callable[..., Any]) -> bytes:
+    if get_hashing_option("callable_tokens") == "bytecode":
+        function = getattr(func, "__func__", func)  # unbind methods
+        if isinstance(function, FunctionType):
+            return b"code" + _function_digest(function, set())
+    return inspect.getsource(func).encode("utf-8")
+
+
+def _finalize(hexdigest: str, engine: str, algorithm: str) -> str:
+    if engine == "legacy":
+        return hexdigest[:TRUNCATE_HASH_TO]
+    tag = _algorithms[algorithm][0]
+    return f"{tag}{TOKEN_VERSION}-{hexdigest[:TRUNCATE_HASH_TO]}"
+
+
+class _MemoEntry(NamedTuple):
+    refs: Tuple["weakref.ref[Any]", ...]
+    guard: Hashable
+    encoded: bytes
+    nbytes: int
+
+
+_memo: "OrderedDict[Hashable, _MemoEntry]" = OrderedDict()
+_memo_bytes = 0
+_memo_lock = threading.Lock()
+
+
+def clear_hash_memo() -> None:
+    """Forget all tokens remembered under the ``memo_max_bytes`` option.
+
+    Needed only after modifying a memoized DataFrame in place without
+    replacing any of its arrays, which the memo cannot detect.
+    """
+    global _memo_bytes
+    with _memo_lock:
+        _memo.clear()
+        _memo_bytes = 0
+
+
+def _frame_identity(df: pd.DataFrame) -> Optional[Tuple[List[Any], Hashable, int]]:
+    """Objects and guard that identify the current contents of a DataFrame.
+
+    Assigning to a column or replacing the index replaces the corresponding
+    object; writes into existing numpy buffers are caught by the buffer address
+    only when pandas had to copy the buffer first (copy-on-write).
+    """
+    arrays = getattr(getattr(df, "_mgr", None), "arrays", None)
+    if arrays is None:
+        return None
+    addresses = tuple(
+        a.__array_interface__["data"][0] if isinstance(a, np.ndarray) else None for a in arrays
+    )
+    nbytes = int(df.memory_usage(index=True, deep=False).sum())
+    return [df, df.index, df.columns, *arrays], (df.shape, addresses), nbytes
+
+
+def _path_identity(path: Path) -> Optional[Tuple[List[Any], Hashable, int]]:
+    """Guard built from the (inode, size, mtime_ns) of a file or of every file in a tree."""
+    if path.is_dir():
+        base = os.fspath(path)
+        dir_paths, file_paths = _list_tree(path)
+        stats = [os.stat(os.path.join(base, p)) for p in file_paths]
+        guard: Hashable = (
+            tuple(dir_paths),
+            tuple(file_paths),
+            tuple(tuple(stat_key(st)) for st in stats),
+        )
+    else:
+        stats = [os.stat(path)]
+        guard = tuple(stat_key(stats[0]))
+    if any(is_racy(st) for st in stats):
+        return None
+    return [], guard, sum(st.st_size for st in stats)
+
+
+def _memoized(arg: Any, key: Tuple[Any, ...], compute: Callable[[], bytes]) -> bytes:
+    """Return compute() for arg, reusing the result of an earlier call if arg is unchanged."""
+    global _memo_bytes
+    max_bytes = get_hashing_option("memo_max_bytes")
+    if not max_bytes:
+        return compute()
+    if isinstance(arg, pd.DataFrame):
+        identity = _frame_identity(arg)
+        memo_key: Hashable = ("frame", id(arg), *key)
+    else:
+        identity = _path_identity(arg)
+        memo_key = ("path", os.path.abspath(arg), *key)
+    if identity is None:
+        return compute()
+    objects, guard, nbytes = identity
+
+    with _memo_lock:
+        entry = _memo.get(memo_key)
+        # weak references rule out a new object that happens to reuse an id()
+        if (
+            entry is not None
+            and entry.guard == guard
+            and len(entry.refs) == len(objects)
+            and all(ref() is obj for ref, obj in zip(entry.refs, objects))
+        ):
+            _memo.move_to_end(memo_key)
+            return entry.encoded
+
+    encoded = compute()
+    if nbytes > max_bytes:
+        return encoded
+    try:
+        refs = tuple(weakref.ref(obj) for obj in objects)
+    except TypeError:
+        return encoded  # some backing array does not support weak references
+    with _memo_lock:
+        previous = _memo.pop(memo_key, None)
+        if previous is not None:
+            _memo_bytes -= previous.nbytes
+        _memo[memo_key] = _MemoEntry(refs, guard, encoded, nbytes)
+        _memo_bytes += nbytes
+        while _memo_bytes > max_bytes:
+            _, evicted = _memo.popitem(last=False)
+            _memo_bytes -= evicted.nbytes
+    return encoded
+
+
+def _leaf_bytes(
+    arg: Any, engine: str, algorithm: str, memo_key: Tuple[Any, ...], full: bool = False
+) -> Any:
+    """Encode a path, callable, DataFrame or bytes-like argument; shared by both engines.
+
+    With `full`, DataFrames are encoded by their untruncated digest.
+    """
+    if isinstance(arg, Path) and arg.is_file():
+        return _memoized(arg, memo_key, lambda: _hash_file_arg(arg, engine))
+    elif isinstance(arg, Path) and arg.is_dir():
+        return _memoized(arg, memo_key, lambda: _hash_dir_arg(arg, engine))
+    elif callable(arg):
+        return _hash_callable(arg)
+    elif isinstance(arg, pd.DataFrame):
+        return _memoized(
+            arg, memo_key, lambda: _hash_data_frame(arg, engine, algorithm, full).encode("utf-8")
+        )
+    # any other bytes-like object, e.g. a pyarrow.Buffer or mmap
+    try:
+        return memoryview(arg).cast("B")
+    except TypeError:
+        raise TypeError(f"Cannot tokenize object of type {type(arg)}") from None
+
+
+def _api_object_fields(obj: APIObject) -> Dict[str, Any]:
+    return {k: v for k, v in obj.__dict__.items() if not k.startswith("_") and not callable(v)}
+
+
+class _Encoded(bytes):
+    """Precomputed encoding of a leaf argument, e.g. a DataFrame hashed elsewhere."""
+
+
+class _CanonicalEncoder:
+    """Single-pass canonical encoding of nested arguments for the streaming engine.
+
+    Every value is written as a type tag followed by a length-prefixed
+    payload; containers write their item count and then their items, mapping
+    entries and set members sorted by their encoding. Small records are
+    batched in a buffer and large payloads are passed to the hasher directly,
+    so a whole structure costs one hasher instead of one per nesting level.
+
+    Parameters
+    ----------
+    algorithm : str
+        Digest algorithm, used for leaves hashed separately (DataFrames, paths)
+    hasher : hasher, optional
+        Receives the encoding; without one the encoding is kept in `buffer`
+    full : bool, default=False
+        Encode leaves hashed separately by their untruncated digests
+    """
+
+    def __init__(
+        self, algorithm: str, hasher: Optional[_Hasher] = None, full: bool = False
+    ) -> None:
+        self.algorithm = algorithm
+        self.hasher = hasher
+        self.full = full
+        self.buffer = bytearray()
+        self.memo_key = (
+            "digest" if full else "streaming",
+            algorithm,
+            get_hashing_option("columnar_fingerprints"),
+        )
+
+    def flush(self) -> None:
+        """Pass buffered records to the hasher."""
+        if self.hasher is not None and self.buffer:
+            self.hasher.update(self.buffer)
+            self.buffer.clear()
+
+    def _write(self, tag: bytes, data: Union[bytes, bytearray, memoryview]) -> None:
+        size = memoryview(data).nbytes
+        self.buffer += tag + pack("<Q", size)
+        if self.hasher is not None and size >= READ_BUFFER_SIZE:
+            self.flush()
+            self.hasher.update(data)
+        else:
+            self.buffer += data
+            if len(self.buffer) >= READ_BUFFER_SIZE:
+                self.flush()
+
+    def _encoded(self, obj: Any) -> bytes:
+        if isinstance(obj, str):
+            data = str.encode(obj, "utf-8")
+            return b"u" + pack("<Q", len(data)) + data
+        encoder = _CanonicalEncoder(self.algorithm, full=self.full)
+        encoder.encode(obj)
+        return bytes(encoder.buffer)
+
+    def encode(self, obj: Any) -> None:
+        """Append the canonical encoding of obj."""
+        # exact type checks first: isinstance against the collections ABCs is slow
+        kind = type(obj)
+        if kind is str:
+            self._write(b"u", obj.encode("utf-8"))
+        elif kind is dict:
+            self._encode_mapping(obj)
+        elif kind is list or kind is tuple:
+            self._encode_sequence(obj)
+        elif kind is int:
+            self._write(b"i", obj.to_bytes(obj.bit_length() // 8 + 1, "little", signed=True))
+        elif isinstance(obj, _Encoded):
+            self._write(b"x", obj)
+        elif isinstance(obj, str):  # e.g. StrEnum members, which are also Sequences
+            self._write(b"u", str.encode(obj, "utf-8"))
+        elif isinstance(obj, (bytes, bytearray, memoryview)):
+            self._write(b"b", obj)
+        elif obj is None:
+            self.buffer += b"N"
+        elif isinstance(obj, bool):
+            self.buffer += b"T" if obj else b"F"
+        elif isinstance(obj, int):
+            self._write(b"i", obj.to_bytes(obj.bit_length() // 8 + 1, "little", signed=True))
+        elif isinstance(obj, float):
+            self.buffer += b"f" + pack("<d", obj)
+        elif isinstance(obj, Mapping):
+            self._encode_mapping(obj)
+        elif isinstance(obj, AbstractSet):
+            members = sorted(self._encoded(item) for item in obj)
+            self.buffer += b"S" + pack("<Q", len(members))
+            for member in members:
+                self.buffer += member
+        elif isinstance(obj, Sequence):
+            self._encode_sequence(obj)
+        elif isinstance(obj, date):
+            self._write(b"d", obj.isoformat().encode("utf-8"))
+        elif isinstance(obj, np.ndarray) and not obj.dtype.hasobject:
+            self._write(b"a", repr((obj.dtype.descr, obj.shape)).encode("utf-8"))
+            self._write(b"b", np.ascontiguousarray(obj).reshape(-1).view(np.uint8).data)
+        elif isinstance(obj, np.ndarray):
+            self.buffer += b"A"
+            self.encode([list(obj.shape), obj.tolist()])
+        elif isinstance(obj, APIObject):
+            self.buffer += b"o"
+            self._encode_mapping(_api_object_fields(obj))
+        else:
+            self._write(
+                b"x", _leaf_bytes(obj, "streaming", self.algorithm, self.memo_key, self.full)
+            )
+
+    def _encode_sequence(self, obj: Sequence[Any]) -> None:
+        self.buffer += b"l" + pack("<Q", len(obj))
+        for item in obj:
+            self.encode(item)
+
+    def _encode_mapping(self, obj: Mapping[Any, Any]) -> None:
+        entries = sorted(((self._encoded(k), v) for k, v in obj.items()), key=lambda e: e[0])
+        self.buffer += b"m" + pack("<Q", len(entries))
+        for key, value in entries:
+            self.buffer += key
+            self.encode(value)
+
+
 def get_hash(*args: Any, **kwargs: Any) -> str:
-    """Hash common python built-ins."""
-    hasher = HASHING_ALGORITHM()
+    """Hash common python built-ins.
+
+    Keyword arguments are hashed along with their names; tokenization itself is
+    configured with `set_hashing_options` or `hashing_options`.
+    """
+    engine, algorithm = _current_engine_and_algorithm()
+    hasher = _new_hasher(algorithm)
+    if engine == "streaming":
+        encoder = _CanonicalEncoder(algorithm, hasher)
+        encoder.encode(args)
+        encoder.encode(kwargs)
+        encoder.flush()
+        return _finalize(hasher.hexdigest(), engine, algorithm)
+
+    memo_key = (engine, algorithm, get_hashing_option("columnar_fingerprints"))
     for arg in args:
-        if isinstance(arg, bytes) or isinstance(arg, memoryview):
+        if isinstance(arg, (bytes, bytearray, memoryview)):
             pass
         elif arg is None:
             arg = int_to_bytes(_NONE_REPRESENTATION)
@@ -60,45 +1243,88 @@ def get_hash(*args: Any, **kwargs: Any) -> str:
         elif isinstance(arg, Mapping):
             d = {k: arg[k] for k in sorted(arg.keys())}
             arg = get_hash(**d).encode("utf-8")
+        elif isinstance(arg, AbstractSet):
+            # order-independent: the sorted tokens of the members
+            arg = get_hash(*sorted(get_hash(item) for item in arg)).encode("utf-8")
         elif isinstance(arg, Sequence):
             arg = get_hash(*arg).encode("utf-8")
         elif isinstance(arg, date):
             arg = arg.isoformat().encode("utf-8")
-        elif isinstance(arg, Path) and arg.is_file():
-            with open(arg, "rb") as f:
-                arg = ""
-                for chunk in iter(lambda: f.read(8192), b""):
-                    arg = get_hash(chunk, arg)
-                arg = arg.encode("utf-8")
-        elif isinstance(arg, Path) and arg.is_dir():
-            base_path = arg
-            arg = ""
-            for root, dirs, files in os.walk(base_path):
-                dirs.sort()  # force deterministic traversal
-                arg = get_hash(str(Path(root).relative_to(base_path)), *dirs, *files, arg)
-                for filename in sorted(files):
-                    with open(os.path.join(root, filename), "rb") as f:
-                        for chunk in iter(lambda: f.read(8192), b""):
-                            arg = get_hash(chunk, arg)
-            arg = arg.encode("utf-8")
-
-        elif callable(arg):
-            arg = inspect.getsource(arg).encode("utf-8")
-        elif isinstance(arg, pd.DataFrame):
-            arg = get_hash(
-                hash_pandas_object(arg.columns).to_numpy().data,
-                hash_pandas_object(arg.dtypes).to_numpy().data,
-                hash_pandas_object(arg.index).to_numpy().data,
-                hash_pandas_object(arg).to_numpy().data,
-            )
-            arg = arg.encode("utf-8")
+        elif isinstance(arg, np.ndarray):
+            arg = _hash_array(arg, engine, algorithm).encode("utf-8")
         elif isinstance(arg, APIObject):
-            d = {k: v for k, v in arg.__dict__.items() if not k.startswith("_") and not callable(v)}
-            arg = get_hash(d).encode("utf-8")
+            arg = get_hash(_api_object_fields(arg)).encode("utf-8")
         else:
-            raise TypeError(f"Cannot tokenize object of type {type(arg)}")
+            arg = _leaf_bytes(arg, engine, algorithm, memo_key)
         hasher.update(arg)
     for key in kwargs:
         hasher.update(key.encode("utf-8"))
         hasher.update(get_hash(kwargs[key]).encode("utf-8"))
-    return hasher.hexdigest()[:TRUNCATE_HASH_TO]
+    return _finalize(hasher.hexdigest(), engine, algorithm)
+
+
+def get_digest(*args: Any, **kwargs: Any) -> str:
+    """Full-length sha256 hex digest of the canonical encoding of the arguments.
+
+    Unlike the truncated tokens of `get_hash`, which may collide, digests are
+    suitable as cache keys. The streaming engine's encoding is used whatever
+    engine is configured, so e.g. ``True`` and ``1`` or ``0.1`` and
+    ``0.10000000001`` never share a digest. DataFrames are encoded by their
+    full digest too, rather than by their token.
+    """
+    hasher = _new_hasher("sha256")
+    encoder = _CanonicalEncoder("sha256", hasher, full=True)
+    encoder.encode(args)
+    encoder.encode(kwargs)
+    encoder.flush()
+    return hasher.hexdigest()
+
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+_process_pool_size: Optional[int] = None
+_process_pool_lock = threading.Lock()
+
+
+def _get_process_pool(size: int) -> ProcessPoolExecutor:
+    global _process_pool, _process_pool_size
+    with _process_pool_lock:
+        if _process_pool is None or _process_pool_size != size:
+            if _process_pool is not None:
+                _process_pool.shutdown(wait=False)
+            _process_pool = ProcessPoolExecutor(max_workers=size)
+            _process_pool_size = size
+        return _process_pool
+
+
+def _hash_data_frame_with_options(df: pd.DataFrame, options: Dict[str, Any]) -> _Encoded:
+    """Entry point for hashing a DataFrame in a worker process."""
+    with hashing_options(**options):
+        engine, algorithm = _current_engine_and_algorithm()
+        return _Encoded(_hash_data_frame(df, engine, algorithm).encode("utf-8"))
+
+
+async def get_hash_async(*args: Any, **kwargs: Any) -> str:
+    """Awaitable version of `get_hash` that does not block the event loop.
+
+    Tokenization runs in a worker thread with the hashing options of the
+    calling context. With the ``dataframe_processes`` option set, top-level
+    DataFrame arguments are hashed in a process pool first; tokens are the
+    same either way.
+    """
+    processes = get_hashing_option("dataframe_processes")
+    if processes is not None:
+        loop = asyncio.get_running_loop()
+        pool = _get_process_pool(processes)
+        options = {name: get_hashing_option(name) for name in _default_options}
+        options.pop("dataframe_processes")
+
+        async def tokenize(arg: Any) -> Any:
+            if not isinstance(arg, pd.DataFrame):
+                return arg
+            return await loop.run_in_executor(pool, _hash_data_frame_with_options, arg, options)
+
+        # both engines encode a precomputed leaf exactly like the DataFrame itself
+        tokens = await asyncio.gather(*map(tokenize, [*args, *kwargs.values()]))
+        args = tuple(tokens[: len(args)])
+        kwargs = dict(zip(kwargs, tokens[len(args) :]))
+    return await asyncio.to_thread(get_hash, *args, **kwargs)
@@ -0,0 +1,188 @@
+#
+# Copyright 2024 DataRobot, Inc. and its affiliates.
+#
+# All rights reserved.
+#
+# DataRobot, Inc.
+#
+# This is proprietary source code of DataRobot, Inc. and its
+# affiliates.
+#
+# Released under the terms of DataRobot Tool and Utility Agreement.
+# https://www.datarobot.com/wp-content/uploads/2021/07/DataRobot-Tool-and-Utility-Agreement.pdf
+
+"""Ignore files for directory hashing and uploads.
+
+Patterns follow .gitignore syntax: ``#`` comments, ``!`` negation, a trailing
+``/`` to match directories only, ``*``, ``?``, ``[...]`` and ``**``. Patterns
+without a slash match a name at any depth; others are anchored to the root.
+In a .dockerignore every pattern is anchored to the root and, as with docker,
+a pattern matching a directory matches everything inside it while later
+negations can still re-include files inside it. Otherwise, as with git, files
+inside an ignored directory cannot be re-included.
+"""
+
+import os
+import re
+from typing import Iterator, List, NamedTuple, Optional, Tuple, Union
+
+DEFAULT_IGNORE_FILE = ".dripignore"
+DOCKER_IGNORE_FILE = ".dockerignore"
+
+
+class _Rule(NamedTuple):
+    regex: "re.Pattern[str]"
+    negate: bool
+    dir_only: bool
+
+
+def _glob_to_regex(pattern: str) -> str:
+    parts = []
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            parts.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            parts.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            parts.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            parts.append("[^/]")
+            i += 1
+        elif pattern[i] == "[" and "]" in pattern[i + 2 :]:
+            end = pattern.index("]", i + 2)
+            body = pattern[i + 1 : end]
+            if body.startswith("!"):
+                body = "^" + body[1:]
+            parts.append("[" + body.replace("\\", "\\\\") + "]")
+            i = end + 1
+        else:
+            parts.append(re.escape(pattern[i]))
+            i += 1
+    return "".join(parts)
+
+
+class IgnoreRules:
+    """Parsed ignore patterns, applied to posix paths relative to the root.
+
+    Parameters
+    ----------
+    patterns : list of str
+        Lines of an ignore file
+    anchored : bool, default=False
+        Anchor every pattern to the root (.dockerignore semantics)
+    """
+
+    def __init__(self, patterns: List[str], anchored: bool = False) -> None:
+        self.anchored = anchored
+        self.rules: List[_Rule] = []
+        for line in patterns:
+            line = line.rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.strip("/") if anchored else line.rstrip("/")
+            if not line:
+                continue
+            if anchored or "/" in line:
+                regex = _glob_to_regex(line.lstrip("/"))
+            else:
+                regex = "(?:.*/)?" + _glob_to_regex(line)
+            self.rules.append(_Rule(re.compile(regex + r"\Z"), negate, dir_only))
+
+    @property
+    def prunes_directories(self) -> bool:
+        """Whether everything inside an ignored directory is ignored as well."""
+        return not (self.anchored and any(rule.negate for rule in self.rules))
+
+    def is_ignored(self, rel_path: str, is_dir: bool) -> bool:
+        """Whether a path relative to the root is excluded; the last matching rule wins."""
+        candidates = [(rel_path, is_dir)]
+        if self.anchored:
+            # as with docker, a rule matching a parent directory matches the path
+            parts = rel_path.split("/")
+            candidates += [("/".join(parts[:i]), True) for i in range(len(parts) - 1, 0, -1)]
+        for rule in reversed(self.rules):
+            for path, path_is_dir in candidates:
+                if rule.dir_only and not path_is_dir:
+                    continue
+                if rule.regex.match(path):
+                    return not rule.negate
+        return False
+
+
+def load_ignore_rules(
+    base_path: Union[str, "os.PathLike[str]"], ignore_file: Optional[str]
+) -> Optional[IgnoreRules]:
+    """Read the ignore file at the root of a directory, if there is one."""
+    if ignore_file is None:
+        return None
+    try:
+        with open(os.path.join(base_path, ignore_file), "r", encoding="utf-8") as f:
+            patterns = f.read().splitlines()
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    return IgnoreRules(patterns, anchored=os.path.basename(ignore_file) == DOCKER_IGNORE_FILE)
+
+
+def _walk_unpruned(base: str, rules: IgnoreRules) -> Iterator[Tuple[str, List[str], List[str]]]:
+    """Walk every directory, keeping those not ignored or holding files that are not."""
+    entries = []
+    for root, dirs, files in os.walk(base):
+        dirs.sort()
+        rel_root = os.path.relpath(root, base).replace(os.sep, "/")
+        prefix = f"{rel_root}/" if rel_root != "." else ""
+        files = [f for f in files if not rules.is_ignored(prefix + f, False)]
+        entries.append((root, prefix, dirs, files))
+    kept = set()
+    for _, prefix, dirs, files in reversed(entries):  # subdirectories first
+        if prefix and (
+            files
+            or any(prefix + d in kept for d in dirs)
+            or not rules.is_ignored(prefix[:-1], True)
+        ):
+            kept.add(prefix[:-1])
+    for root, prefix, dirs, files in entries:
+        if not prefix or prefix[:-1] in kept:
+            yield root, [d for d in dirs if prefix + d in kept], files
+
+
+def walk(
+    base_path: Union[str, "os.PathLike[str]"], rules: Optional[IgnoreRules]
+) -> Iterator[Tuple[str, List[str], List[str]]]:
+    """Like `os.walk` but skipping ignored entries; ``dirs`` may be sorted in place.
+
+    Ignored directories are not descended into unless rules may re-include
+    files inside them.
+    """
+    base = os.fspath(base_path)
+    if rules is not None and not rules.prunes_directories:
+        yield from _walk_unpruned(base, rules)
+        return
+    for root, dirs, files in os.walk(base):
+        if rules is not None:
+            rel_root = os.path.relpath(root, base).replace(os.sep, "/")
+            prefix = f"{rel_root}/" if rel_root != "." else ""
+            dirs[:] = [d for d in dirs if not rules.is_ignored(prefix + d, True)]
+            files = [f for f in files if not rules.is_ignored(prefix + f, False)]
+        yield root, dirs, files
+
+
+def iter_files(
+    folder_path: Union[str, "os.PathLike[str]"], ignore_file: Optional[str] = DEFAULT_IGNORE_FILE
+) -> Iterator[Tuple[str, str]]:
+    """Yield (path, path relative to folder_path) for each file not ignored.
+
+    Used to build uploads that contain the same files directory tokens cover.
+    """
+    rules = load_ignore_rules(folder_path, ignore_file)
+    for root, _, files in walk(folder_path, rules):
+        for name in files:
+            file_path = os.path.join(root, name)
+            yield file_path, os.path.relpath(file_path, folder_path)
@@ -0,0 +1,150 @@
+#
+# Copyright 2024 DataRobot, Inc. and its affiliates.
+#
+# All rights reserved.
+#
+# DataRobot, Inc.
+#
+# This is proprietary source code of DataRobot, Inc. and its
+# affiliates.
+#
+# Released under the terms of DataRobot Tool and Utility Agreement.
+# https://www.datarobot.com/wp-content/uploads/2021/07/DataRobot-Tool-and-Utility-Agreement.pdf
+
+from copy import deepcopy
+import functools
+import pickle
+import time
+from typing import Any, Dict, Optional
+
+try:
+    import fsspec
+    from kedro.io.core import get_protocol_and_path
+except ImportError as e:
+    raise ImportError("Consider including kedro in your project requirements`") from e
+
+from datarobotx.idp.common.checkpoint_manifest import write_atomic
+
+
+class OutputCache:
+    """Content-addressed store of node outputs, keyed by a digest of their inputs.
+
+    Unlike the single checksum recorded per checkpointed node, the cache keeps
+    the outputs of every input combination it has seen, so switching back to
+    earlier parameters or data is a cache hit. Keys should be full-length
+    digests (see `hashing.get_digest`) rather than truncated tokens, which may
+    collide. Outputs are pickled under ``<filepath>/<node name>/<digest>.pkl``;
+    only point it at storage whose writers are trusted.
+
+    Each use of an entry adds an empty ``<digest>.<time>.used`` marker next
+    to it. When a new entry takes the cache over `max_entries` or `max_bytes`,
+    the least recently used entries are evicted. Sizes and last use times are
+    read from a listing of the cache rather than from a shared index, so any
+    number of processes can use a cache at once.
+
+    Parameters
+    ----------
+    filepath : str
+        Root directory of the cache, e.g. ``s3://bucket/node-outputs``
+    max_entries : int, optional
+        Maximum number of cached input combinations, across all nodes
+    max_bytes : int, optional
+        Maximum total size of the pickled outputs
+    credentials : dict, optional
+        Credentials passed to the fsspec filesystem
+    fs_args : dict, optional
+        Extra arguments passed to the fsspec filesystem
+    """
+
+    def __init__(
+        self,
+        filepath: str,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        credentials: Optional[Dict[str, Any]] = None,
+        fs_args: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        _fs_args = deepcopy(fs_args) or {}
+        _credentials = deepcopy(credentials) or {}
+
+        protocol, path = get_protocol_and_path(filepath)
+        if protocol == "file":
+            _fs_args.setdefault("auto_mkdir", True)
+
+        self._root = path.rstrip("/")
+        self._fs = fsspec.filesystem(protocol, **_credentials, **_fs_args)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+    def _entry_path(self, key: str) -> str:
+        return f"{self._root}/{key}.pkl"
+
+    def _mark_used(self, key: str) -> None:
+        with self._fs.open(f"{self._root}/{key}.{time.time_ns()}.used", "wb"):
+            pass
+
+    def _rm(self, path: str) -> None:
+        try:
+            self._fs.rm(path)
+        except FileNotFoundError:
+            pass  # e.g. evicted by another process
+
+    def _evict(self) -> None:
+        """Remove least recently used entries until the limits are met."""
+        try:
+            listing = self._fs.find(self._root, detail=True)
+        except FileNotFoundError:
+            return
+        sizes: Dict[str, int] = {}
+        markers: Dict[str, Dict[str, int]] = {}  # entry key -> marker path -> time
+        for path, info in listing.items():
+            name = path[len(self._root) + 1 :]
+            if name.endswith(".pkl"):
+                sizes[name[: -len(".pkl")]] = int(info.get("size") or 0)
+            elif name.endswith(".used"):
+                key, _, used = name[: -len(".used")].rpartition(".")
+                if used.isdigit():
+                    markers.setdefault(key, {})[path] = int(used)
+
+        def last_used(key: str) -> int:
+            return max(markers.get(key, {}).values(), default=0)
+
+        total = sum(sizes.values())
+        count = len(sizes)
+        for key in sorted(sizes, key=last_used):
+            over_entries = self.max_entries is not None and count > self.max_entries
+            over_bytes = self.max_bytes is not None and total > self.max_bytes
+            if not (over_entries or over_bytes):
+                break
+            self._rm(self._entry_path(key))
+            for path in markers.pop(key, {}):
+                self._rm(path)
+            total -= sizes[key]
+            count -= 1
+        for key_markers in markers.values():
+            for path in sorted(key_markers, key=key_markers.__getitem__)[:-1]:
+                self._rm(path)  # superseded by a later use
+
+    def get(self, node_name: str, digest: str) -> Optional[Dict[str, Any]]:
+        """Retrieve the outputs cached for a node and input digest, if any."""
+        key = f"{node_name}/{digest}"
+        try:
+            with self._fs.open(self._entry_path(key), "rb") as f:
+                outputs: Dict[str, Any] = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        self._mark_used(key)
+        return outputs
+
+    def put(self, node_name: str, digest: str, outputs: Dict[str, Any]) -> None:
+        """Cache the outputs of a node for an input digest."""
+        key = f"{node_name}/{digest}"
+        write_atomic(
+            self._fs,
+            self._entry_path(key),
+            functools.partial(pickle.dump, outputs, protocol=pickle.HIGHEST_PROTOCOL),
+            binary=True,
+        )
+        self._mark_used(key)
+        if self.max_entries is not None or self.max_bytes is not None:
+            self._evict()
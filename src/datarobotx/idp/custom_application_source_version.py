@@ -16,6 +16,7 @@
 
 import contextlib
 from json import dumps
+import logging
 import os
 from pathlib import Path
 from typing import Any, Dict, List, Literal, Optional, Tuple
@@ -26,7 +27,10 @@ import datarobot as dr
 from datarobot.models.runtime_parameters import RuntimeParameterValue
 from datarobot.utils import camelize
 
-from datarobotx.idp.common.hashing import get_hash
+from datarobotx.idp.common.hashing import get_hash, get_hashing_option, record_manifest
+from datarobotx.idp.common.ignore import iter_files
+
+logger = logging.getLogger(__name__)
 
 
 def _find_existing_custom_application_source_version(
@@ -60,12 +64,11 @@ def _make_request(
         with contextlib.ExitStack() as stack:
             if "folder_path" in kwargs:
                 folder_path = kwargs["folder_path"]
-                for root_path, _, file_paths in os.walk(folder_path):
-                    for path in file_paths:
-                        file_path = os.path.join(root_path, path)
-                        file = stack.enter_context(open(file_path, "rb"))
-                        upload_data.append(("file", (os.path.basename(file_path), file)))
-                        upload_data.append(("filePath", os.path.relpath(file_path, folder_path)))
+                ignore_file = get_hashing_option("ignore_file")
+                for file_path, rel_path in iter_files(folder_path, ignore_file):
+                    file = stack.enter_context(open(file_path, "rb"))
+                    upload_data.append(("file", (os.path.basename(file_path), file)))
+                    upload_data.append(("filePath", rel_path))
 
             if "runtime_parameter_values" in kwargs:
                 upload_data.append(
@@ -202,6 +205,16 @@ def _get_or_create_custom_application_source_version(
             ),
             runtime_parameter_values=runtime_parameter_values_objs,
         )
+    if "folder_path" in kwargs:
+        changes = record_manifest(
+            f"custom_application_source:{custom_application_source_id}", Path(kwargs["folder_path"])
+        )
+        if changes is not None:
+            logger.info(
+                "Created custom application source version %s (%s)",
+                new_version_id,
+                changes.summary(),
+            )
     return new_version_id
 
 
@@ -26,7 +26,8 @@ from datarobot.rest import handle_http_error
 from datarobot.utils import camelize, to_api
 from datarobot.utils.pagination import unpaginate
 
-from datarobotx.idp.common.hashing import get_hash
+from datarobotx.idp.common.hashing import get_hash, get_hashing_option
+from datarobotx.idp.common.ignore import iter_files
 
 
 def _create_or_update_custom_job(
@@ -48,12 +49,10 @@ def _create_or_update_custom_job(
             (camelize(k), json.dumps(to_api(v)) if not isinstance(v, str) else v)
             for k, v in kwargs.items()
         ]
-        for root_path, _, file_paths in os.walk(folder_path):
-            for path in file_paths:
-                file_path = os.path.join(root_path, path)
-                file = stack.enter_context(open(file_path, "rb"))
-                primary_form_data.append(("file", (os.path.basename(file_path), file)))
-                primary_form_data.append(("filePath", os.path.relpath(file_path, folder_path)))
+        for file_path, rel_path in iter_files(folder_path, get_hashing_option("ignore_file")):
+            file = stack.enter_context(open(file_path, "rb"))
+            primary_form_data.append(("file", (os.path.basename(file_path), file)))
+            primary_form_data.append(("filePath", rel_path))
         encoder = MultipartEncoder(fields=primary_form_data)
         headers["Content-Type"] = encoder.content_type
         if custom_job_id is None:
@@ -11,13 +11,15 @@
 # Released under the terms of DataRobot Tool and Utility Agreement.
 # https://www.datarobot.com/wp-content/uploads/2021/07/DataRobot-Tool-and-Utility-Agreement.pdf
 
+import logging
 import pathlib
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Union
 
 import datarobot as dr
 
-from datarobotx.idp.common.hashing import get_hash
+from datarobotx.idp.common.hashing import get_hash, get_hashing_option, record_manifest
+from datarobotx.idp.common.ignore import iter_files
 
 try:
     from datarobot.models.runtime_parameters import RuntimeParameterValue
@@ -26,6 +28,8 @@ except ImportError as e:
         "datarobot>=3.4.0 is required for custom model versions with runtime parameters"
     ) from e
 
+logger = logging.getLogger(__name__)
+
 
 def _find_existing_custom_model_version(
     custom_model_id: str, model_version_token: str, from_previous: bool
@@ -108,15 +112,28 @@ def _get_or_create(
             create = dr.CustomModelVersion.create_clean  # type: ignore
         else:
             create = dr.CustomModelVersion.create_from_previous  # type: ignore
+        upload_kwargs = dict(kwargs)
+        if folder_path is not None:
+            # upload the same files the token covers, leaving out ignored ones
+            ignore_file = get_hashing_option("ignore_file")
+            upload_kwargs["files"] = [
+                *list(iter_files(folder_path, ignore_file)),
+                *(kwargs.get("files") or []),
+            ]
         env_version = create(
             custom_model_id,
-            folder_path=folder_path,
             max_wait=max_wait,
             runtime_parameter_values=runtime_parameter_values_objs,
-            **kwargs,
+            **upload_kwargs,
         )
 
         env_version.update(description=f"\nChecksum: {model_version_token}")
+        if folder_path is not None:
+            changes = record_manifest(f"custom_model:{custom_model_id}", Path(folder_path))
+            if changes is not None:
+                logger.info(
+                    "Created custom model version %s (%s)", env_version.id, changes.summary()
+                )
 
         if _has_requirements(folder_path, kwargs.get("files", None)):
             _ensure_dependency_build(custom_model_id, env_version.id)
@@ -22,7 +22,7 @@ import datarobot as dr
 from datarobot import Dataset  # type: ignore
 from datarobot.models.use_cases.utils import UseCaseLike
 
-from datarobotx.idp.common.hashing import get_hash
+from datarobotx.idp.common.hashing import get_hash, get_hash_async
 
 
 async def _find_existing_dataset_async(
@@ -80,7 +80,9 @@ def get_or_create_dataset_from_file(
     Notes
     -----
     Records a checksum in the dataset name to allow future calls to this
-    function to validate whether a desired dataset already exists
+    function to validate whether a desired dataset already exists.
+    With ``set_hashing_options(fingerprint_cache=True)`` the checksum of an
+    unchanged file is reused on later runs without reading the file.
     """
     dr.Client(token=token, endpoint=endpoint)  # type: ignore
     dataset_token = get_hash(name, Path(file_path), use_cases, **kwargs)
@@ -112,7 +114,7 @@ async def get_or_create_dataset_from_df_async(
     function to validate whether a desired dataset already exists
     """
     await asyncio.to_thread(dr.Client, token=token, endpoint=endpoint)  # type: ignore[attr-defined]
-    dataset_token = get_hash(name, data_frame, use_cases, **kwargs)
+    dataset_token = await get_hash_async(name, data_frame, use_cases, **kwargs)
 
     try:
         return await _find_existing_dataset_async(
@@ -18,7 +18,8 @@ from typing import Any
 import datarobot as dr
 from datarobot.enums import EXECUTION_ENVIRONMENT_VERSION_BUILD_STATUS
 
-from datarobotx.idp.common.hashing import get_hash
+from datarobotx.idp.common.hashing import get_hash, hashing_options
+from datarobotx.idp.common.ignore import DOCKER_IGNORE_FILE
 
 
 def _find_existing_environment_version(
@@ -48,7 +49,9 @@ def get_or_create_execution_environment_version(
     function to validate whether a desired environment version already exists
     """
     dr.Client(token=token, endpoint=endpoint)  # type: ignore[attr-defined]
-    env_version_token = get_hash(Path(docker_context_path), execution_environment_id, **kwargs)
+    # files excluded from the docker build context cannot affect the environment
+    with hashing_options(ignore_file=DOCKER_IGNORE_FILE):
+        env_version_token = get_hash(Path(docker_context_path), execution_environment_id, **kwargs)
 
     try:
         return _find_existing_environment_version(execution_environment_id, env_version_token)
@@ -0,0 +1,66 @@
+#
+# Copyright 2024 DataRobot, Inc. and its affiliates.
+#
+# All rights reserved.
+#
+# DataRobot, Inc.
+#
+# This is proprietary source code of DataRobot, Inc. and its
+# affiliates.
+#
+# Released under the terms of DataRobot Tool and Utility Agreement.
+# https://www.datarobot.com/wp-content/uploads/2021/07/DataRobot-Tool-and-Utility-Agreement.pdf
+
+"""Throughput of get_hash on nested configuration structures.
+
+Compares the recursive per-level hashing of the legacy engine with the
+single-pass canonical encoder of the streaming engine.
+
+Usage: python -m tests.benchmarks.bench_encoding [--repeat 200]
+"""
+
+import argparse
+import time
+from typing import Any, Callable, Dict
+
+from datarobotx.idp.common.hashing import get_hash, hashing_options
+
+
+def make_config(width: int = 20, depth: int = 3) -> Dict[str, Any]:
+    """Nested dict/list structure shaped like a large autopilot or guard config."""
+    if depth == 0:
+        return {
+            f"param_{i}": [i, float(i) / 3, f"value_{i}", None, i % 2 == 0] for i in range(width)
+        }
+    return {f"level_{depth}_{i}": make_config(width // 2, depth - 1) for i in range(width // 2)}
+
+
+def measure(f: Callable[[], Any], repeat: int) -> float:
+    """Measure calls per second, best of three runs of `repeat` calls."""
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            f()
+        best = min(best, time.perf_counter() - start)
+    return repeat / best
+
+
+def run(repeat: int) -> None:
+    config = make_config()
+
+    def streaming() -> str:
+        with hashing_options(engine="streaming"):
+            return get_hash(config)
+
+    for label, f in [
+        ("nested config  legacy (recursive)", lambda: get_hash(config)),
+        ("nested config  streaming (canonical)", streaming),
+    ]:
+        print(f"{label:<38} {measure(f, repeat):>10.1f} ops/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=200)
+    run(parser.parse_args().repeat)
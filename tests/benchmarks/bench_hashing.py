@@ -0,0 +1,99 @@
+#
+# Copyright 2024 DataRobot, Inc. and its affiliates.
+#
+# All rights reserved.
+#
+# DataRobot, Inc.
+#
+# This is proprietary source code of DataRobot, Inc. and its
+# affiliates.
+#
+# Released under the terms of DataRobot Tool and Utility Agreement.
+# https://www.datarobot.com/wp-content/uploads/2021/07/DataRobot-Tool-and-Utility-Agreement.pdf
+
+"""Throughput of get_hash file and directory tokenization.
+
+Usage: python -m tests.benchmarks.bench_hashing [--size-mb 256]
+"""
+
+import argparse
+import functools
+import os
+from pathlib import Path
+import tempfile
+import time
+from typing import Any, Callable, Optional
+
+from datarobotx.idp.common.hashing import get_hash, hashing_options
+
+
+def chunk_chained_reference(path: Path) -> str:
+    """Per-chunk recursive get_hash, as tokenized before the streaming engine."""
+    token = ""
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(8192), b""):
+            token = get_hash(chunk, token)
+    return token
+
+
+def measure(f: Callable[[], Any], n_bytes: int, repeat: int = 3) -> float:
+    """Best-of-n throughput in MB/s."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        f()
+        best = min(best, time.perf_counter() - start)
+    return n_bytes / best / 1e6
+
+
+def run(size_mb: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        big_file = Path(tmp) / "big.bin"
+        big_file.write_bytes(os.urandom(size_mb * 1024 * 1024))
+        n_bytes = big_file.stat().st_size
+
+        tree = Path(tmp) / "tree"
+        for i in range(2000):
+            sub = tree / f"d{i % 20}"
+            sub.mkdir(parents=True, exist_ok=True)
+            (sub / f"f{i}.py").write_bytes(os.urandom(4096))
+        tree_bytes = 2000 * 4096
+
+        def streaming(path: Path, max_workers: Optional[int] = None, **options: Any) -> str:
+            with hashing_options(engine="streaming", max_workers=max_workers, **options):
+                return get_hash(path)
+
+        def legacy_no_mmap(path: Path) -> str:
+            with hashing_options(mmap_threshold=None):
+                return get_hash(path)
+
+        cases = [
+            ("file  chunk-chained (reference)", lambda: chunk_chained_reference(big_file), n_bytes),
+            ("file  legacy engine", lambda: get_hash(big_file), n_bytes),
+            ("file  legacy engine, no mmap", lambda: legacy_no_mmap(big_file), n_bytes),
+            ("file  streaming engine", lambda: streaming(big_file), n_bytes),
+            (
+                "file  streaming engine, no mmap",
+                lambda: streaming(big_file, mmap_threshold=None),
+                n_bytes,
+            ),
+            ("tree  legacy engine", lambda: get_hash(tree), tree_bytes),
+            ("tree  streaming engine", lambda: streaming(tree), tree_bytes),
+            ("tree  streaming engine, 8 workers", lambda: streaming(tree, 8), tree_bytes),
+        ]
+        for algorithm in ["sha256", "blake2b", "xxh3"]:
+            try:
+                streaming(big_file, algorithm=algorithm)
+            except ImportError:
+                continue  # xxhash is optional
+            f = functools.partial(streaming, big_file, algorithm=algorithm)
+            cases.append((f"file  streaming engine, {algorithm}", f, n_bytes))
+
+        for label, f, size in cases:
+            print(f"{label:<34} {measure(f, size):>10.1f} MB/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size-mb", type=int, default=256)
+    run(parser.parse_args().size_mb)
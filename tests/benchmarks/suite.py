@@ -0,0 +1,243 @@
+#
+# Copyright 2024 DataRobot, Inc. and its affiliates.
+#
+# All rights reserved.
+#
+# DataRobot, Inc.
+#
+# This is proprietary source code of DataRobot, Inc. and its
+# affiliates.
+#
+# Released under the terms of DataRobot Tool and Utility Agreement.
+# https://www.datarobot.com/wp-content/uploads/2021/07/DataRobot-Tool-and-Utility-Agreement.pdf
+
+"""Benchmark suite for get_hash with stored baselines.
+
+Reports MB/s for data-sized inputs and ops/s for small ones. Every result is
+also normalized by the plain hashlib.sha256 throughput measured in the same
+run, so baselines recorded on one machine remain comparable on another.
+
+Usage:
+    python -m tests.benchmarks.suite                     # quick sizes
+    python -m tests.benchmarks.suite --full              # up to 1e8 rows / 1 GiB
+    python -m tests.benchmarks.suite --save tests/benchmarks/baseline.json
+    python -m tests.benchmarks.suite --compare tests/benchmarks/baseline.json
+
+When comparing, cases that regress are measured again, up to --retries more
+times, and their best result is kept, so a noisy run does not fail the
+comparison on its own.
+"""
+
+import argparse
+from hashlib import sha256
+import json
+import os
+from pathlib import Path
+import platform
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+from tests.benchmarks.bench_encoding import make_config
+
+from datarobotx.idp.common.hashing import get_hash, hashing_options
+
+BASELINE_PATH = Path(__file__).parent / "baseline.json"
+DEFAULT_TOLERANCE = 0.3
+DEFAULT_RETRIES = 2
+
+
+class Case(NamedTuple):
+    name: str
+    f: Callable[[], Any]
+    n_bytes: Optional[int]  # None reports ops/s instead of MB/s
+
+
+def calibrate() -> float:
+    """Measure plain hashlib.sha256 throughput in MB/s."""
+    data = os.urandom(64 * 1024 * 1024)
+    return measure(lambda: sha256(data).digest(), len(data))
+
+
+def measure(f: Callable[[], Any], n_bytes: Optional[int], min_time: float = 0.2) -> float:
+    """Measure best-of-three throughput of f, in MB/s or ops/s."""
+    f()  # warm up caches and lazy imports
+    best = float("inf")
+    for _ in range(3):
+        calls = 0
+        start = time.perf_counter()
+        while True:
+            f()
+            calls += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+        best = min(best, elapsed / calls)
+    return n_bytes / best / 1e6 if n_bytes is not None else 1 / best
+
+
+def _with_options(f: Callable[..., Any], *args: Any, **options: Any) -> Callable[[], Any]:
+    def run() -> Any:
+        with hashing_options(**options):
+            return f(*args)
+
+    return run
+
+
+def make_frame(rows: int) -> pd.DataFrame:
+    """Frame with a float, an int and a low-cardinality categorical column."""
+    rng = np.random.default_rng(0)
+    return pd.DataFrame(
+        {
+            "x": rng.normal(size=rows),
+            "n": rng.integers(0, 1000, size=rows),
+            "c": pd.Categorical.from_codes(rng.integers(0, 10, size=rows), list("abcdefghij")),
+        }
+    )
+
+
+def helper(x: int) -> int:
+    """Module-level function called by `node`, traversed by bytecode tokens."""
+    return x * 2
+
+
+def node(df: pd.DataFrame, scale: int = 3) -> pd.DataFrame:
+    """Stand-in for a pipeline node function."""
+    return df.assign(y=lambda d: helper(d["n"]) * scale)
+
+
+def cases(tmp: Path, full: bool) -> Iterator[Case]:
+    """Build the benchmark cases, writing any input files under tmp."""
+    text = "get_or_create_custom_model_version " * 10
+    yield Case("str", lambda: get_hash(text), None)
+    config = make_config()
+    yield Case("nested config, legacy", lambda: get_hash(config), None)
+    yield Case(
+        "nested config, streaming", _with_options(get_hash, config, engine="streaming"), None
+    )
+
+    max_exponent = 8 if full else 6
+    for exponent in range(3, max_exponent + 1):
+        df = make_frame(10**exponent)
+        n_bytes = int(df.memory_usage(index=True).sum())
+        yield Case(f"dataframe 1e{exponent} rows", lambda df=df: get_hash(df), n_bytes)
+
+    big_file = tmp / "big.bin"
+    with open(big_file, "wb") as f:
+        for _ in range(1024 if full else 64):
+            f.write(os.urandom(1024 * 1024))
+    n_bytes = big_file.stat().st_size
+    yield Case("large file, legacy", lambda: get_hash(big_file), n_bytes)
+    yield Case(
+        "large file, streaming", _with_options(get_hash, big_file, engine="streaming"), n_bytes
+    )
+
+    tree = tmp / "tree"
+    n_files = 20000 if full else 2000
+    for i in range(n_files):
+        sub = tree / f"d{i % 50}"
+        sub.mkdir(parents=True, exist_ok=True)
+        (sub / f"f{i}.py").write_bytes(os.urandom(2048))
+    n_bytes = n_files * 2048
+    yield Case("small files dir, legacy", lambda: get_hash(tree), n_bytes)
+    yield Case(
+        "small files dir, streaming", _with_options(get_hash, tree, engine="streaming"), n_bytes
+    )
+
+    yield Case("callable, source", lambda: get_hash(node), None)
+    yield Case(
+        "callable, bytecode", _with_options(get_hash, node, callable_tokens="bytecode"), None
+    )
+
+
+def run(full: bool, select: Optional[str], only: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Run the suite, or only the named cases, and return the results as a baseline document."""
+    calibration = calibrate()
+    print(f"{'sha256 calibration':<32} {calibration:>12.1f} MB/s")
+    results: Dict[str, Dict[str, Any]] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for case in cases(Path(tmp), full):
+            if select is not None and select not in case.name:
+                continue
+            if only is not None and case.name not in only:
+                continue
+            value = measure(case.f, case.n_bytes)
+            unit = "ops/s" if case.n_bytes is None else "MB/s"
+            results[case.name] = {"unit": unit, "value": value, "normalized": value / calibration}
+            print(f"{case.name:<32} {value:>12.1f} {unit}")
+    return {
+        "python": platform.python_version(),
+        "calibration_mb_s": calibration,
+        "full": full,
+        "cases": results,
+    }
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """List the cases whose normalized throughput fell more than tolerance below baseline."""
+    regressions = []
+    print(f"\n{'case':<32} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, current in results["cases"].items():
+        reference = baseline["cases"].get(name)
+        if reference is None:
+            continue
+        change = current["normalized"] / reference["normalized"] - 1
+        flag = "  REGRESSION" if change < -tolerance else ""
+        print(
+            f"{name:<32} {reference['normalized']:>10.4f} {current['normalized']:>10.4f}"
+            f" {change:>+8.1%}{flag}"
+        )
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the suite from the command line; returns a non-zero status on regressions."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--full", action="store_true", help="use the largest input sizes")
+    parser.add_argument("-k", dest="select", help="only run cases whose name contains this")
+    parser.add_argument("--save", type=Path, help="write results as a baseline to this path")
+    parser.add_argument("--compare", type=Path, help="compare against a stored baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument(
+        "--retries", type=int, default=DEFAULT_RETRIES, help="re-measure regressed cases"
+    )
+    args = parser.parse_args(argv)
+
+    results = run(args.full, args.select)
+    if args.save is not None:
+        args.save.write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
+    if args.compare is not None:
+        baseline = json.loads(args.compare.read_text())
+        if baseline.get("full") != results["full"]:
+            print("warning: baseline was recorded with different input sizes", file=sys.stderr)
+        recorded = baseline.get("python", "")
+        if recorded.split(".")[:2] != results["python"].split(".")[:2]:
+            print(
+                f"warning: baseline was recorded on Python {recorded}, "
+                f"comparing on {results['python']}",
+                file=sys.stderr,
+            )
+        regressions = compare(results, baseline, args.tolerance)
+        for _ in range(args.retries):
+            if not regressions:
+                break
+            print(f"\nre-measuring {len(regressions)} case(s)")
+            retried = run(args.full, args.select, only=regressions)
+            for name, current in retried["cases"].items():
+                if current["normalized"] > results["cases"][name]["normalized"]:
+                    results["cases"][name] = current
+            regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} case(s) regressed beyond {args.tolerance:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -11,13 +11,21 @@
 # Released under the terms of DataRobot Tool and Utility Agreement.
 # https://www.datarobot.com/wp-content/uploads/2021/07/DataRobot-Tool-and-Utility-Agreement.pdf
 
+import functools
+import json
+import os
 import uuid
 
+from kedro.framework.hooks.manager import _create_hook_manager
+from kedro.framework.project import settings
 from kedro.io import DataCatalog
-from kedro.pipeline import node
+from kedro.pipeline import node, pipeline
+from kedro.runner import ParallelRunner, SequentialRunner, ThreadRunner
 import pytest
 
 from datarobotx.idp.common.checkpoint_hooks import CheckpointHooks
+from datarobotx.idp.common.checkpoint_manifest import CheckpointManifest
+from datarobotx.idp.common.output_cache import OutputCache
 
 
 @pytest.fixture
@@ -55,8 +63,18 @@ def catalog(tmp_path):
     )
 
 
+def prepare(hooks, node_, catalog):
+    """Checkpointed node as run by kedro once before_pipeline_run has been called."""
+    filtered = pipeline([node_]).filter()
+    hooks.before_pipeline_run(run_params={}, pipeline=filtered, catalog=catalog)
+    (prepared,) = filtered.nodes
+    return prepared
+
+
 def test_checkpoint_hooks(dummy_node, catalog, counter):
     hooks = CheckpointHooks()
+    original_func = dummy_node.func
+    dummy_node = prepare(hooks, dummy_node, catalog)
     uid = str(uuid.uuid4())
     inputs = {"dummy_input": catalog.load("dummy_input")}
     hooks.before_node_run(dummy_node, catalog, inputs, False, uid)
@@ -70,6 +88,293 @@ def test_checkpoint_hooks(dummy_node, catalog, counter):
 
     hooks.before_node_run(dummy_node, catalog, inputs, False, uid)
     outputs_deux = dummy_node.run(inputs)
+    for output in outputs_deux:
+        catalog.save(output, outputs_deux[output])
     hooks.after_node_run(dummy_node, catalog, inputs, outputs, False, uid)
     assert len(counter) == 1
-    assert outputs_deux == outputs
+    assert {name: catalog.load(name) for name in outputs_deux} == outputs
+    assert dummy_node.func.func is original_func
+
+
+def test_unprepared_node_skipped(dummy_node, catalog, counter, caplog):
+    hooks = CheckpointHooks()
+    uid = str(uuid.uuid4())
+    inputs = {"dummy_input": catalog.load("dummy_input")}
+    for _ in range(2):
+        hooks.before_node_run(dummy_node, catalog, inputs, False, uid)
+        outputs = dummy_node.run(inputs)
+        for output in outputs:
+            catalog.save(output, outputs[output])
+        hooks.after_node_run(dummy_node, catalog, inputs, outputs, False, uid)
+    assert len(counter) == 1
+    assert "not prepared by before_pipeline_run" in caplog.text
+
+
+def test_unnamed_partial_node_keeps_name(counter, catalog):
+    def f(dummy_input, suffix):
+        counter.append("1")
+        return dummy_input + suffix
+
+    partial_node = node(
+        functools.partial(f, suffix="!"),
+        inputs="dummy_input",
+        outputs="mock_output",
+        tags=["checkpoint"],
+    )
+    with pytest.warns(UserWarning, match="partial"):
+        assert prepare(CheckpointHooks(), partial_node, catalog).name == partial_node.name
+
+
+def test_runner_without_pipeline_hooks(chain, counter):
+    config, nodes = chain
+    hook_manager = _create_hook_manager()
+    hook_manager.register(CheckpointHooks())
+    for _ in range(2):
+        catalog = DataCatalog.from_config(config)
+        SequentialRunner().run(pipeline(nodes), catalog, hook_manager)
+    assert counter == ["first", "second"]
+
+
+def test_checkpoint_hit_does_not_load_outputs(dummy_node, catalog, tmp_path, monkeypatch):
+    hooks = CheckpointHooks()
+    dummy_node = prepare(hooks, dummy_node, catalog)
+    uid = str(uuid.uuid4())
+    inputs = {"dummy_input": catalog.load("dummy_input")}
+    hooks.before_node_run(dummy_node, catalog, inputs, False, uid)
+    catalog.save("mock_output", dummy_node.run(inputs)["mock_output"])
+    hooks.after_node_run(dummy_node, catalog, inputs, {}, False, uid)
+    mtime = (tmp_path / "foo.txt").stat().st_mtime_ns
+
+    loaded = []
+    load = DataCatalog.load
+    monkeypatch.setattr(
+        DataCatalog, "load", lambda self, name, *a: loaded.append(name) or load(self, name, *a)
+    )
+    hooks.before_node_run(dummy_node, catalog, inputs, False, uid)
+    catalog.save("mock_output", dummy_node.run(inputs)["mock_output"])
+    assert "mock_output" not in loaded
+    assert (tmp_path / "foo.txt").stat().st_mtime_ns == mtime
+    assert catalog.load("mock_output") == "foo"
+
+
+@pytest.fixture
+def chain(tmp_path, counter):
+    (tmp_path / "raw.txt").write_text("foo")
+
+    def text_ds(name):
+        return {"type": "kedro_datasets.text.TextDataset", "filepath": str(tmp_path / name)}
+
+    config = {
+        name: text_ds(f"{name}.txt")
+        for name in ["raw", "mid", "out", "first_checksum", "second_checksum"]
+    }
+
+    def first(raw):
+        counter.append("first")
+        return raw.upper()
+
+    def second(mid):
+        counter.append("second")
+        return mid + "!"
+
+    nodes = [
+        node(first, inputs="raw", outputs="mid", tags=["checkpoint"], name="first"),
+        node(second, inputs="mid", outputs="out", tags=["checkpoint"], name="second"),
+    ]
+    return config, nodes
+
+
+@pytest.fixture
+def loaded(monkeypatch):
+    names = []
+    load = DataCatalog.load
+
+    def recording_load(self, name, *args):
+        names.append(name)
+        return load(self, name, *args)
+
+    monkeypatch.setattr(DataCatalog, "load", recording_load)
+    return names
+
+
+def run_pipeline(config, nodes, hooks, runner=None):
+    hook_manager = _create_hook_manager()
+    hook_manager.register(hooks)
+    catalog = DataCatalog.from_config(config)
+    filtered = pipeline(nodes).filter()
+    hook_manager.hook.before_pipeline_run(run_params={}, pipeline=filtered, catalog=catalog)
+    run_result = (runner or SequentialRunner()).run(filtered, catalog, hook_manager)
+    hook_manager.hook.after_pipeline_run(
+        run_params={}, run_result=run_result, pipeline=filtered, catalog=catalog
+    )
+
+
+def test_pipeline_pruning(chain, counter, loaded, tmp_path):
+    config, nodes = chain
+    run_pipeline(config, nodes, CheckpointHooks())
+    assert counter == ["first", "second"]
+    assert (tmp_path / "out.txt").read_text() == "FOO!"
+    assert "raw" in loaded
+
+    loaded.clear()
+    run_pipeline(config, nodes, CheckpointHooks())
+    assert counter == ["first", "second"]
+    assert "raw" not in loaded and "mid" not in loaded
+
+    (tmp_path / "raw.txt").write_text("bar")
+    run_pipeline(config, nodes, CheckpointHooks())
+    assert counter == ["first", "second", "first", "second"]
+    assert (tmp_path / "out.txt").read_text() == "BAR!"
+
+
+def test_pipeline_pruning_requires_unchanged_upstream(chain, counter, tmp_path):
+    config, nodes = chain
+    run_pipeline(config, nodes, CheckpointHooks())
+    (tmp_path / "raw.txt").write_text("FOO")  # first() produces identical output
+    run_pipeline(config, nodes, CheckpointHooks())
+    # second is not pruned but still skipped once its loaded input matches
+    assert counter == ["first", "second", "first"]
+    run_pipeline(config, nodes, CheckpointHooks())
+    assert counter == ["first", "second", "first"]
+
+
+def test_pipeline_pruning_disabled(chain, counter, loaded):
+    config, nodes = chain
+    run_pipeline(config, nodes, CheckpointHooks())
+    loaded.clear()
+    run_pipeline(config, nodes, CheckpointHooks(prune=False))
+    assert counter == ["first", "second"]
+    assert "raw" in loaded
+
+
+def test_pipeline_pruning_after_checkpoint_hit(chain, counter, loaded, tmp_path):
+    config, nodes = chain
+    run_pipeline(config, nodes, CheckpointHooks())
+    raw = tmp_path / "raw.txt"
+    mtime = raw.stat().st_mtime_ns + 10**9
+    os.utime(raw, ns=(mtime, mtime))  # first is skipped, but not pruned
+
+    loaded.clear()
+    run_pipeline(config, nodes, CheckpointHooks())
+    assert counter == ["first", "second"]
+    assert loaded.count("mid") == 1  # by kedro, for second; not to fingerprint it
+
+    loaded.clear()
+    run_pipeline(config, nodes, CheckpointHooks())
+    assert "raw" not in loaded and "mid" not in loaded
+
+
+@pytest.mark.parametrize("prune", [True, False])
+def test_in_memory_inputs_loaded_once(chain, counter, loaded, prune):
+    config, nodes = chain
+    config["raw"] = {"type": "kedro.io.MemoryDataset", "data": "foo"}
+    for _ in range(2):
+        loaded.clear()
+        run_pipeline(config, nodes, CheckpointHooks(prune=prune))
+        assert loaded.count("raw") == 1
+    assert counter == ["first", "second"]
+
+
+def test_manifest(chain, counter, loaded, tmp_path):
+    config, nodes = chain
+    path = str(tmp_path / "manifest.json")
+    run_pipeline(config, nodes, CheckpointHooks(manifest=CheckpointManifest(path)))
+    assert not (tmp_path / "first_checksum.txt").exists()
+    assert set(json.loads((tmp_path / "manifest.json").read_text())["checksums"]) == {
+        "first",
+        "second",
+    }
+
+    loaded.clear()
+    run_pipeline(config, nodes, CheckpointHooks(manifest=CheckpointManifest(path)))
+    assert counter == ["first", "second"]
+    assert "raw" not in loaded
+
+
+def test_output_cache(chain, counter, tmp_path):
+    config, nodes = chain
+
+    def hooks():
+        return CheckpointHooks(output_cache=OutputCache(str(tmp_path / "cache")))
+
+    run_pipeline(config, nodes, hooks())
+    (entry,) = (tmp_path / "cache" / "first").glob("*.pkl")
+    assert len(entry.stem) == 64  # keyed on a full digest, not a checksum token
+    (tmp_path / "raw.txt").write_text("bar")
+    run_pipeline(config, nodes, hooks())
+    assert (tmp_path / "out.txt").read_text() == "BAR!"
+    assert counter == ["first", "second", "first", "second"]
+
+    (tmp_path / "raw.txt").write_text("foo")
+    run_pipeline(config, nodes, hooks())
+    assert (tmp_path / "out.txt").read_text() == "FOO!"
+    assert counter == ["first", "second", "first", "second"]
+
+
+def _log_call(name):
+    with open(os.environ["CHECKPOINT_HOOKS_TEST_LOG"], "a") as f:
+        f.write(name + "\n")
+
+
+def shout(raw):
+    _log_call("shout")
+    return raw.upper()
+
+
+def exclaim(raw):
+    _log_call("exclaim")
+    return raw + "!"
+
+
+@pytest.mark.parametrize("runner_class", [ThreadRunner, ParallelRunner])
+def test_concurrent_runners(runner_class, tmp_path, monkeypatch):
+    log = tmp_path / "calls.log"
+    log.touch()
+    monkeypatch.setenv("CHECKPOINT_HOOKS_TEST_LOG", str(log))
+    (tmp_path / "raw").write_text("foo")
+    config = {
+        name: {"type": "kedro_datasets.text.TextDataset", "filepath": str(tmp_path / name)}
+        for name in ["raw", "loud", "excited", "shout_checksum", "exclaim_checksum"]
+    }
+    nodes = [
+        node(shout, inputs="raw", outputs="loud", tags=["checkpoint"], name="shout"),
+        node(exclaim, inputs="raw", outputs="excited", tags=["checkpoint"], name="exclaim"),
+    ]
+    original_funcs = [n.func for n in nodes]
+
+    def run(hooks):
+        # ParallelRunner workers register the hooks found in the project settings
+        monkeypatch.setattr(settings, "HOOKS", (hooks,), raising=False)
+        run_pipeline(config, nodes, hooks, runner_class(max_workers=2))
+        return sorted(log.read_text().split())
+
+    assert run(CheckpointHooks()) == ["exclaim", "shout"]
+    assert (tmp_path / "loud").read_text() == "FOO"
+    assert (tmp_path / "excited").read_text() == "foo!"
+    # skipped in before_node_run, in the worker threads or processes
+    assert run(CheckpointHooks(prune=False)) == ["exclaim", "shout"]
+    (tmp_path / "raw").write_text("bar")
+    assert run(CheckpointHooks(prune=False)) == ["exclaim", "exclaim", "shout", "shout"]
+    assert (tmp_path / "loud").read_text() == "BAR"
+    assert [n.func for n in nodes] == original_funcs
+
+
+@pytest.mark.parametrize("flush_interval", [None, 1])
+def test_parallel_runner_manifest(tmp_path, monkeypatch, flush_interval):
+    monkeypatch.setenv("CHECKPOINT_HOOKS_TEST_LOG", str(tmp_path / "calls.log"))
+    (tmp_path / "raw").write_text("foo")
+    names = [f"shout{i}" for i in range(8)]
+    config = {
+        name: {"type": "kedro_datasets.text.TextDataset", "filepath": str(tmp_path / name)}
+        for name in ["raw", *[f"{name}_out" for name in names]]
+    }
+    nodes = [
+        node(shout, inputs="raw", outputs=f"{name}_out", tags=["checkpoint"], name=name)
+        for name in names
+    ]
+    path = tmp_path / "manifest.json"
+    manifest = CheckpointManifest(str(path), flush_interval=flush_interval)
+    hooks = CheckpointHooks(manifest=manifest)
+    monkeypatch.setattr(settings, "HOOKS", (hooks,), raising=False)
+    run_pipeline(config, nodes, hooks, ParallelRunner(max_workers=8))
+    assert sorted(json.loads(path.read_text())["checksums"]) == names
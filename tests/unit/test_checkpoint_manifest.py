@@ -0,0 +1,86 @@
+#
+# Copyright 2024 DataRobot, Inc. and its affiliates.
+#
+# All rights reserved.
+#
+# DataRobot, Inc.
+#
+# This is proprietary source code of DataRobot, Inc. and its
+# affiliates.
+#
+# Released under the terms of DataRobot Tool and Utility Agreement.
+# https://www.datarobot.com/wp-content/uploads/2021/07/DataRobot-Tool-and-Utility-Agreement.pdf
+
+import json
+
+from datarobotx.idp.common.checkpoint_manifest import CheckpointManifest
+
+
+def test_roundtrip(tmp_path):
+    path = tmp_path / "checkpoints" / "manifest.json"
+    manifest = CheckpointManifest(str(path))
+    assert manifest.get("node") is None
+    manifest.set("node", "abc")
+    assert manifest.get("node") == "abc"
+    assert not path.exists()
+
+    manifest.flush()
+    assert CheckpointManifest(str(path)).get("node") == "abc"
+    assert [p.name for p in path.parent.iterdir()] == ["manifest.json"]
+
+
+def test_flush_merges_concurrent_updates(tmp_path):
+    path = str(tmp_path / "manifest.json")
+    first, second = CheckpointManifest(path), CheckpointManifest(path)
+    first.set("a", "1")
+    second.set("b", "2")
+    first.flush()
+    second.flush()
+    manifest = CheckpointManifest(path)
+    assert (manifest.get("a"), manifest.get("b")) == ("1", "2")
+
+
+def test_flush_interval(tmp_path):
+    path = tmp_path / "manifest.json"
+    manifest = CheckpointManifest(str(path), flush_interval=2)
+    manifest.set("a", "1")
+    assert not path.exists()
+    manifest.set("b", "2")
+    assert json.loads(path.read_text())["checksums"] == {"a": "1", "b": "2"}
+
+
+def test_flush_interval_without_compacting(tmp_path):
+    path = tmp_path / "manifest.json"
+    manifest = CheckpointManifest(str(path), flush_interval=1)
+    manifest.compact = False
+    manifest.set("a", "1")
+    assert not path.exists()
+    assert len(list((tmp_path / "manifest.json.journal").iterdir())) == 1
+    assert CheckpointManifest(str(path)).get("a") == "1"
+
+
+def test_corrupt_manifest(tmp_path):
+    path = tmp_path / "manifest.json"
+    path.write_text("{not json")
+    manifest = CheckpointManifest(str(path))
+    assert manifest.get("a") is None
+    manifest.set("a", "1")
+    manifest.flush()
+    assert CheckpointManifest(str(path)).get("a") == "1"
+
+
+def test_journal(tmp_path):
+    path = tmp_path / "manifest.json"
+    main = CheckpointManifest(str(path))
+    main.set("a", "1")
+    main.flush()
+    for name in ["b", "c"]:
+        worker = CheckpointManifest(str(path))
+        worker.set(name, name)
+        worker.flush(compact=False)
+    assert json.loads(path.read_text())["checksums"] == {"a": "1"}
+    assert CheckpointManifest(str(path)).get("c") == "c"
+
+    main.flush()
+    assert json.loads(path.read_text())["checksums"] == {"a": "1", "b": "b", "c": "c"}
+    assert not list((tmp_path / "manifest.json.journal").iterdir())
@@ -0,0 +1,166 @@
+#
+# Copyright 2024 DataRobot, Inc. and its affiliates.
+#
+# All rights reserved.
+#
+# DataRobot, Inc.
+#
+# This is proprietary source code of DataRobot, Inc. and its
+# affiliates.
+#
+# Released under the terms of DataRobot Tool and Utility Agreement.
+# https://www.datarobot.com/wp-content/uploads/2021/07/DataRobot-Tool-and-Utility-Agreement.pdf
+
+import os
+import time
+
+import pytest
+
+from datarobotx.idp.common import fingerprint_cache, hashing
+from datarobotx.idp.common.fingerprint_cache import FingerprintIndex, fingerprint
+from datarobotx.idp.common.hashing import (
+    CHECKSUM_FILE_EXTENSION,
+    build_manifest,
+    get_hash,
+    hashing_options,
+)
+
+
+def _age(path, seconds=60):
+    past = time.time() - seconds
+    for root, _, files in os.walk(path):
+        for name in files:
+            os.utime(os.path.join(root, name), (past, past))
+    if path.is_file():
+        os.utime(path, (past, past))
+
+
+@pytest.fixture
+def tree(tmp_path):
+    base = tmp_path / "tree"
+    (base / "sub").mkdir(parents=True)
+    (base / "foo.txt").write_text("foo")
+    (base / "sub" / "bar.txt").write_text("bar")
+    _age(base)
+    return base
+
+
+@pytest.fixture
+def no_reads(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("file contents were read")
+
+    def factory():
+        monkeypatch.setattr(hashing, "_file_digest", fail)
+        monkeypatch.setattr(hashing, "_legacy_chain", fail)
+
+    return factory
+
+
+@pytest.mark.parametrize("engine", ["legacy", "streaming"])
+@pytest.mark.parametrize("target", ["file", "dir"])
+def test_unchanged_files_skip_io(tmp_path, tree, no_reads, engine, target):
+    path = tree if target == "dir" else tree / "foo.txt"
+    with hashing_options(engine=engine):
+        uncached = get_hash(path)
+        with hashing_options(fingerprint_cache=tmp_path / "cache"):
+            token1 = get_hash(path)
+            assert len(list((tmp_path / "cache").glob(f"*{CHECKSUM_FILE_EXTENSION}"))) == 1
+            no_reads()
+            token2 = get_hash(path)
+    assert uncached == token1 == token2
+
+
+@pytest.mark.parametrize("engine", ["legacy", "streaming"])
+def test_changed_file_is_rehashed(tmp_path, tree, engine):
+    with hashing_options(engine=engine, fingerprint_cache=tmp_path / "cache"):
+        token1 = get_hash(tree)
+        (tree / "sub" / "bar.txt").write_text("baz")
+        _age(tree, seconds=30)
+        token2 = get_hash(tree)
+    with hashing_options(engine=engine):
+        assert token2 == get_hash(tree)
+    assert token1 != token2
+
+
+def test_recently_modified_files_not_recorded(tmp_path):
+    path = tmp_path / "fresh.txt"
+    path.write_text("foo")
+    with hashing_options(fingerprint_cache=tmp_path / "cache"):
+        get_hash(path)
+    assert not list((tmp_path / "cache").glob(f"*{CHECKSUM_FILE_EXTENSION}"))
+
+
+def test_corrupt_index(tmp_path):
+    index_path = tmp_path / f"index{CHECKSUM_FILE_EXTENSION}"
+    index_path.write_text("{not json")
+    index = FingerprintIndex(index_path)
+    assert index.lookup("foo", [1, 2, 3]) is None
+    index.record("foo", [1, 2, 3], "abc")
+    index.save()
+    assert FingerprintIndex(index_path).lookup("foo", [1, 2, 3]) == "abc"
+    assert FingerprintIndex(index_path).lookup("foo", [1, 2, 4]) is None
+
+
+@pytest.fixture
+def large_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(fingerprint_cache, "SAMPLE_BLOCK_SIZE", 16)
+    monkeypatch.setattr(fingerprint_cache, "SAMPLE_THRESHOLD", 1024)
+    path = tmp_path / "large.bin"
+    path.write_bytes(bytes(range(256)) * 16)
+    _age(path)
+    return path
+
+
+def test_sampled_fingerprint(tree, large_file):
+    small = tree / "foo.txt"
+    assert len(fingerprint(str(small), small.stat())) == 3
+    assert len(fingerprint(str(large_file), large_file.stat())) == 4
+
+
+@pytest.mark.parametrize("engine", ["legacy", "streaming"])
+def test_sampled_blocks_catch_rewrite_preserving_stat(tmp_path, large_file, no_reads, engine):
+    st = large_file.stat()
+    with hashing_options(engine=engine, fingerprint_cache=tmp_path / "cache"):
+        token1 = get_hash(large_file)
+        # same size, same inode and mtime restored, different last block
+        with open(large_file, "r+b") as f:
+            f.seek(-1, os.SEEK_END)
+            f.write(b"\0")
+        os.utime(large_file, ns=(st.st_atime_ns, st.st_mtime_ns))
+        token2 = get_hash(large_file)
+        no_reads()
+        assert get_hash(large_file) == token2
+    assert token1 != token2
+
+
+def _rewrite_preserving_stat(path):
+    st = path.stat()
+    with open(path, "r+b") as f:
+        f.seek(-1, os.SEEK_END)
+        f.write(b"\0")
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+
+@pytest.fixture
+def large_file_dir(tmp_path, large_file):
+    directory = tmp_path / "data"
+    directory.mkdir()
+    path = large_file.rename(directory / large_file.name)
+    _age(path)
+    return directory
+
+
+@pytest.mark.parametrize("engine", ["legacy", "streaming"])
+def test_sampled_blocks_catch_rewrite_in_directory(tmp_path, large_file_dir, engine):
+    with hashing_options(engine=engine, fingerprint_cache=tmp_path / "cache"):
+        token = get_hash(large_file_dir)
+        assert get_hash(large_file_dir) == token
+        _rewrite_preserving_stat(large_file_dir / "large.bin")
+        assert get_hash(large_file_dir) != token
+
+
+def test_manifest_reuse_checks_sampled_blocks(large_file_dir):
+    previous = build_manifest(large_file_dir)
+    _rewrite_preserving_stat(large_file_dir / "large.bin")
+    assert build_manifest(large_file_dir, previous).root != previous.root
@@ -11,6 +11,16 @@
 # Released under the terms of DataRobot Tool and Utility Agreement.
 # https://www.datarobot.com/wp-content/uploads/2021/07/DataRobot-Tool-and-Utility-Agreement.pdf
 
+import asyncio
+import threading
+import time
+
+from kedro.io import DataCatalog, DatasetError
+import pytest
+
+from datarobotx.idp.common import handle_io as handle_io_module
+from datarobotx.idp.common.handle_io import clear_catalog_cache, handle_io
+
 # from kedro.io import DataCatalog
 # import pytest
 
@@ -325,3 +335,314 @@
 #     captured_inputs.clear()
 #     f(inputs={"foo": "credentials:foo.bar1"}, outputs=list(catalog_config.keys())[0])
 #     assert captured_inputs["foo"] == credentials["foo"]["bar1"]
+
+
+@pytest.fixture
+def text_catalog(tmp_path):
+    (tmp_path / "in.txt").write_text("foo")
+    return {
+        "in_ds": {"type": "kedro_datasets.text.TextDataset", "filepath": str(tmp_path / "in.txt")},
+        "out_ds": {
+            "type": "kedro_datasets.text.TextDataset",
+            "filepath": str(tmp_path / "out.txt"),
+        },
+        "scratch": {"type": "kedro.io.MemoryDataset"},
+    }
+
+
+@pytest.fixture
+def from_config_calls(monkeypatch):
+    clear_catalog_cache()
+    calls = []
+    from_config = DataCatalog.from_config
+
+    def counting_from_config(*args, **kwargs):
+        calls.append(args)
+        return from_config(*args, **kwargs)
+
+    monkeypatch.setattr(handle_io_module.DataCatalog, "from_config", counting_from_config)
+    yield calls
+    clear_catalog_cache()
+
+
+def test_catalog_cached(text_catalog, from_config_calls, tmp_path):
+    params = {"suffix": "!"}
+
+    @handle_io(catalog=text_catalog, parameters=lambda: params)
+    def append(text, suffix):
+        return text + suffix
+
+    append(inputs=["in_ds", "params:suffix"], outputs="out_ds")
+    append(inputs=["in_ds", "params:suffix"], outputs="out_ds")
+    assert (tmp_path / "out.txt").read_text() == "foo!"
+    assert len(from_config_calls) == 1
+
+    params["suffix"] = "?"
+    append(inputs=["in_ds", "params:suffix"], outputs="out_ds")
+    assert (tmp_path / "out.txt").read_text() == "foo?"
+    assert len(from_config_calls) == 2
+
+    clear_catalog_cache()
+    append(inputs=["in_ds", "params:suffix"], outputs="out_ds")
+    assert len(from_config_calls) == 3
+
+
+def test_memory_datasets_not_shared(text_catalog, from_config_calls):
+    @handle_io(catalog=text_catalog)
+    def identity(text):
+        return text
+
+    identity(inputs="in_ds", outputs="scratch")
+    with pytest.raises(DatasetError):
+        identity(inputs="scratch", outputs="out_ds")
+    assert len(from_config_calls) == 1
+
+
+def test_cache_disabled(text_catalog, from_config_calls):
+    @handle_io(catalog=text_catalog, cache_catalog=False)
+    def identity(text):
+        return text
+
+    identity(inputs="in_ds", outputs="out_ds")
+    identity(inputs="in_ds", outputs="out_ds")
+    assert len(from_config_calls) == 2
+
+
+@pytest.mark.parametrize(
+    "first, second",
+    [(0.1, 0.10000000001), (True, 1), (["a", "b"], ["ab"])],
+)
+def test_cache_key_exact(text_catalog, from_config_calls, first, second):
+    received = []
+
+    @handle_io(catalog=text_catalog, parameters=lambda: {"p": params})
+    def record(p):
+        received.append(p)
+
+    params = first
+    record(inputs="params:p", outputs=None)
+    params = second
+    record(inputs="params:p", outputs=None)
+    assert received == [first, second]
+    assert type(received[1]) is type(second)
+    assert len(from_config_calls) == 2
+
+
+def test_cached_versioned_output(text_catalog, from_config_calls, tmp_path, caplog):
+    text_catalog["versioned_ds"] = {
+        "type": "pickle.PickleDataset",
+        "filepath": str(tmp_path / "out.pkl"),
+        "versioned": True,
+    }
+
+    @handle_io(catalog=text_catalog)
+    def identity(text):
+        return text
+
+    for _ in range(3):
+        identity(inputs="in_ds", outputs="versioned_ds")
+    assert len(list((tmp_path / "out.pkl").iterdir())) == 3
+    assert len(from_config_calls) == 1
+    assert "Replacing dataset" not in caplog.text
+
+
+def _versioned_cached_dataset(filepath):
+    return {
+        "type": "kedro.io.CachedDataset",
+        "versioned": True,
+        "dataset": {"type": "pickle.PickleDataset", "filepath": str(filepath)},
+    }
+
+
+def test_versioned_wrapped_output(text_catalog, tmp_path):
+    text_catalog["cached_ds"] = _versioned_cached_dataset(tmp_path / "cached.pkl")
+
+    @handle_io(catalog=text_catalog)
+    def identity(text):
+        return text
+
+    for _ in range(2):
+        identity(inputs="in_ds", outputs="cached_ds")
+    assert len(list((tmp_path / "cached.pkl").iterdir())) == 2
+
+
+def test_versioned_wrapped_and_plain(text_catalog, tmp_path):
+    text_catalog["cached_ds"] = _versioned_cached_dataset(tmp_path / "cached.pkl")
+    text_catalog["versioned_ds"] = {
+        "type": "pickle.PickleDataset",
+        "filepath": str(tmp_path / "out.pkl"),
+        "versioned": True,
+    }
+
+    @handle_io(catalog=text_catalog)
+    def identity(text):
+        return text
+
+    for _ in range(2):
+        identity(inputs="in_ds", outputs="out_ds")
+        identity(inputs="in_ds", outputs="cached_ds")
+        identity(inputs="in_ds", outputs="versioned_ds")
+    assert len(list((tmp_path / "cached.pkl").iterdir())) == 2
+    assert len(list((tmp_path / "out.pkl").iterdir())) == 2
+
+
+@pytest.fixture
+def checkpoint_catalog(text_catalog, tmp_path):
+    text_catalog["checksum_ds"] = {
+        "type": "kedro_datasets.text.TextDataset",
+        "filepath": str(tmp_path / "checksum.txt"),
+    }
+    return text_catalog
+
+
+def test_metadata_checkpoint_skips_loads(checkpoint_catalog, tmp_path, monkeypatch):
+    clear_catalog_cache()
+    params = {"suffix": "!"}
+    calls = []
+
+    @handle_io(catalog=checkpoint_catalog, parameters=lambda: params, checkpoint_mode="metadata")
+    def append(text, suffix):
+        calls.append(text)
+        return text + suffix
+
+    def run():
+        append(inputs=["in_ds", "params:suffix"], outputs="out_ds", checkpoint="checksum_ds")
+
+    run()
+    assert (tmp_path / "out.txt").read_text() == "foo!"
+
+    loaded = []
+    load = DataCatalog.load
+    monkeypatch.setattr(
+        DataCatalog, "load", lambda self, name, *a: loaded.append(name) or load(self, name, *a)
+    )
+    run()
+    assert len(calls) == 1
+    assert "in_ds" not in loaded
+
+    (tmp_path / "in.txt").write_text("foo2")
+    run()
+    assert len(calls) == 2
+    assert (tmp_path / "out.txt").read_text() == "foo2!"
+
+    params["suffix"] = "?"
+    run()
+    assert len(calls) == 3
+    run()
+    assert len(calls) == 3
+
+
+@pytest.mark.parametrize("cache_catalog", [True, False])
+def test_metadata_checkpoint_versioned_input(checkpoint_catalog, tmp_path, cache_catalog):
+    clear_catalog_cache()
+    checkpoint_catalog["versioned_ds"] = {
+        "type": "pickle.PickleDataset",
+        "filepath": str(tmp_path / "in.pkl"),
+        "versioned": True,
+    }
+    DataCatalog.from_config(checkpoint_catalog).save("versioned_ds", "foo")
+    calls = []
+
+    @handle_io(catalog=checkpoint_catalog, cache_catalog=cache_catalog, checkpoint_mode="metadata")
+    def identity(text):
+        calls.append(text)
+        return text
+
+    for _ in range(2):
+        identity(inputs="versioned_ds", outputs="out_ds", checkpoint="checksum_ds")
+    assert calls == ["foo"]
+
+
+def test_invalid_checkpoint_mode(checkpoint_catalog):
+    with pytest.raises(ValueError):
+        handle_io(catalog=checkpoint_catalog, checkpoint_mode="fast")
+
+
+@pytest.fixture
+def two_inputs(text_catalog, tmp_path):
+    (tmp_path / "in2.txt").write_text("bar")
+    text_catalog["in2_ds"] = {
+        "type": "kedro_datasets.text.TextDataset",
+        "filepath": str(tmp_path / "in2.txt"),
+    }
+    return text_catalog
+
+
+def test_concurrent_loads(two_inputs, tmp_path, monkeypatch):
+    barrier = threading.Barrier(2, timeout=10)
+    load = DataCatalog.load
+
+    def waiting_load(self, name, *args):
+        barrier.wait()  # only returns once both inputs are being loaded
+        return load(self, name, *args)
+
+    monkeypatch.setattr(DataCatalog, "load", waiting_load)
+
+    @handle_io(catalog=two_inputs, max_workers=2, cache_catalog=False)
+    def concat(first, second):
+        return first + second
+
+    concat(inputs=["in_ds", "in2_ds"], outputs="out_ds")
+    assert (tmp_path / "out.txt").read_text() == "foobar"
+    concat(inputs={"second": "in_ds", "first": "in2_ds"}, outputs="out_ds")
+    assert (tmp_path / "out.txt").read_text() == "barfoo"
+
+
+def test_concurrent_errors_are_deterministic(two_inputs, monkeypatch):
+    def failing_load(self, name, *args):
+        if name == "in2_ds":
+            time.sleep(0.05)
+        raise KeyError(name)
+
+    monkeypatch.setattr(DataCatalog, "load", failing_load)
+
+    @handle_io(catalog=two_inputs, max_workers=2, cache_catalog=False)
+    def concat(first, second):
+        return first + second
+
+    with pytest.raises(KeyError, match="in2_ds"):
+        concat(inputs=["in2_ds", "in_ds"], outputs="out_ds")
+
+
+def test_async_function(checkpoint_catalog, tmp_path):
+    calls = []
+
+    @handle_io(catalog=checkpoint_catalog, cache_catalog=False)
+    async def shout(text):
+        calls.append(text)
+        await asyncio.sleep(0)
+        return text.upper()
+
+    assert asyncio.iscoroutinefunction(shout)
+    asyncio.run(shout(inputs="in_ds", outputs="out_ds", checkpoint="checksum_ds"))
+    assert (tmp_path / "out.txt").read_text() == "FOO"
+    asyncio.run(shout(inputs="in_ds", outputs="out_ds", checkpoint="checksum_ds"))
+    assert len(calls) == 1
+
+
+def test_async_functions_run_concurrently(two_inputs, tmp_path):
+    two_inputs["out2_ds"] = {
+        "type": "kedro_datasets.text.TextDataset",
+        "filepath": str(tmp_path / "out2.txt"),
+    }
+    running = []
+    peak = []
+
+    @handle_io(catalog=two_inputs, cache_catalog=False)
+    async def slow_identity(text):
+        running.append(text)
+        peak.append(len(running))
+        await asyncio.sleep(0.1)
+        running.remove(text)
+        return text
+
+    async def main():
+        await asyncio.gather(
+            slow_identity(inputs="in_ds", outputs="out_ds"),
+            slow_identity(inputs="in2_ds", outputs="out2_ds"),
+        )
+
+    asyncio.run(main())
+    assert max(peak) == 2
+    assert (tmp_path / "out.txt").read_text() == "foo"
+    assert (tmp_path / "out2.txt").read_text() == "bar"
@@ -11,19 +11,37 @@
 # Released under the terms of DataRobot Tool and Utility Agreement.
 # https://www.datarobot.com/wp-content/uploads/2021/07/DataRobot-Tool-and-Utility-Agreement.pdf
 
+import asyncio
 from contextlib import contextmanager
+import enum
+import hashlib
 import os
 from pathlib import Path
 import shutil
 import string
+import threading
 import time
 
 import numpy as np
 import pandas as pd
+from pandas.util import hash_pandas_object
 import pytest
 
 from datarobot import Project
-from datarobotx.idp.common.hashing import get_hash
+from datarobotx.idp.common import hashing
+from datarobotx.idp.common.hashing import (
+    build_manifest,
+    clear_hash_memo,
+    diff_manifests,
+    get_digest,
+    get_hash,
+    get_hash_async,
+    hashing_options,
+    parse_token,
+    record_manifest,
+    register_hashing_algorithm,
+    set_hashing_options,
+)
 
 
 @pytest.fixture
@@ -66,6 +84,18 @@ def simple_folder(tmp_path):
     return factory
 
 
+@pytest.fixture
+def golden_tree(tmp_path):
+    base = tmp_path / "tree"
+    (base / "a" / "b").mkdir(parents=True)
+    (base / "c").mkdir()
+    (base / "top.txt").write_bytes(b"x" * 20000)
+    (base / "a" / "one.bin").write_bytes(bytes(range(256)) * 100)
+    (base / "a" / "b" / "two.txt").write_text("hello")
+    (base / "c" / "empty.txt").write_bytes(b"")
+    return base
+
+
 class TestHasher:
     def test_none(self):
         token = get_hash(None)
@@ -210,3 +240,527 @@ class TestHasher:
 
         token3 = get_hash(Project(id="12345", project_name="foo"))
         assert token1 != token3
+
+
+class TestLegacyCompatibility:
+    """Tokens recorded on DR assets by earlier releases must keep matching."""
+
+    def test_paths(self, golden_tree):
+        assert get_hash(golden_tree) == "27459fb"
+        assert get_hash(golden_tree / "top.txt") == "128e67a"
+        assert get_hash(golden_tree / "a" / "one.bin") == "1b22871"
+        assert get_hash(golden_tree / "c" / "empty.txt") == "e3b0c44"
+
+    def test_nested(self):
+        token = get_hash({"foo": "bar", "bar": [1, 2, 3.0], "n": None}, "x", k={"a": (1, 2)})
+        assert token == "64fade2"
+
+
+class TestStreamingEngine:
+    def test_versioned_token(self, golden_tree):
+        with hashing_options(engine="streaming"):
+            token = get_hash(golden_tree)
+        assert token.startswith("s3-")
+        assert parse_token(token) == ("sha256", 3, token[3:])
+        assert parse_token(get_hash(golden_tree)) == ("sha256", 1, get_hash(golden_tree))
+
+    def test_file_path(self, golden_tree):
+        with hashing_options(engine="streaming"):
+            token1 = get_hash(golden_tree / "top.txt")
+            token2 = get_hash(golden_tree / "top.txt")
+            (golden_tree / "top.txt").write_bytes(b"x" * 19999 + b"y")
+            token3 = get_hash(golden_tree / "top.txt")
+        assert token1 == token2
+        assert token1 != token3
+
+    def test_dir_path(self, simple_folder):
+        with hashing_options(engine="streaming"):
+            with simple_folder() as f:
+                token1 = get_hash(f)
+            with simple_folder() as f:
+                token2 = get_hash(f)
+            with simple_folder(bonus_dir=True) as f:
+                token3 = get_hash(f)
+            with simple_folder(bonus_file=True) as f:
+                token4 = get_hash(f)
+        assert token1 == token2
+        assert len({token1, token3, token4}) == 3
+
+    def test_renamed_file(self, golden_tree):
+        with hashing_options(engine="streaming"):
+            token1 = get_hash(golden_tree)
+            (golden_tree / "a" / "one.bin").rename(golden_tree / "a" / "uno.bin")
+            token2 = get_hash(golden_tree)
+        assert token1 != token2
+
+    @pytest.mark.parametrize("max_workers", [1, 2, 8])
+    def test_parallel_dir_path(self, golden_tree, max_workers):
+        with hashing_options(engine="streaming"):
+            sequential = get_hash(golden_tree)
+            with hashing_options(max_workers=max_workers):
+                assert get_hash(golden_tree) == sequential
+
+    def test_options(self):
+        with pytest.raises(ValueError):
+            set_hashing_options(engine="foo")
+        with pytest.raises(ValueError):
+            set_hashing_options(max_workers=0)
+        with pytest.raises(ValueError):
+            with hashing_options(foo="bar"):
+                pass
+        with pytest.raises(ValueError):
+            parse_token("not-a-token")
+
+
+class TestAlgorithms:
+    @pytest.mark.parametrize("algorithm, tag", [("sha256", "s"), ("blake2b", "b"), ("xxh3", "x")])
+    def test_tagged_tokens(self, golden_tree, algorithm, tag):
+        if algorithm == "xxh3":
+            pytest.importorskip("xxhash")
+        with hashing_options(engine="streaming", algorithm=algorithm):
+            tokens = [get_hash("foo", {"bar": 1}), get_hash(golden_tree), get_hash(golden_tree)]
+        assert all(t.startswith(f"{tag}3-") for t in tokens)
+        assert tokens[1] == tokens[2]
+        assert parse_token(tokens[0])[:2] == (algorithm, 3)
+
+    def test_algorithms_differ(self, golden_tree):
+        tokens = set()
+        for algorithm in ["sha256", "blake2b"]:
+            with hashing_options(engine="streaming", algorithm=algorithm):
+                tokens.add(parse_token(get_hash(golden_tree))[2])
+        assert len(tokens) == 2
+
+    def test_non_default_algorithm_implies_streaming(self):
+        with hashing_options(algorithm="blake2b"):
+            assert get_hash("foo").startswith("b3-")
+        assert get_hash("foo") == get_hash("foo")
+        assert len(get_hash("foo")) == 7
+
+    def test_scoped_algorithm_in_worker_threads(self, golden_tree):
+        with hashing_options(algorithm="blake2b"):
+            sequential = get_hash(golden_tree)
+            with hashing_options(max_workers=4):
+                assert get_hash(golden_tree) == sequential
+
+    def test_register(self, monkeypatch):
+        monkeypatch.setattr(hashing, "_algorithms", dict(hashing._algorithms))
+        register_hashing_algorithm("sha512", "z", hashlib.sha512)
+        with hashing_options(algorithm="sha512"):
+            token = get_hash("foo")
+        assert parse_token(token) == ("sha512", 3, token[3:])
+        with pytest.raises(ValueError):
+            register_hashing_algorithm("other", "z", hashlib.sha512)
+        with pytest.raises(ValueError):
+            set_hashing_options(algorithm="md4")
+
+
+def _whole_frame_token(df):
+    """Token as computed before chunking, from hash_pandas_object on the whole frame."""
+    hasher = hashlib.sha256()
+    hasher.update(hash_pandas_object(df.columns).to_numpy().data)
+    hasher.update(hash_pandas_object(df.dtypes).to_numpy().data)
+    hasher.update(hash_pandas_object(df.index).to_numpy().data)
+    hasher.update(hash_pandas_object(df).to_numpy().data)
+    engine = hashing.get_hashing_option("engine")
+    frame_token = hashing._finalize(hasher.hexdigest(), engine, "sha256")
+    return get_hash(hashing._Encoded(frame_token.encode("utf-8")))
+
+
+class TestDataFrames:
+    @pytest.fixture(params=["mixed", "multi-index", "no-rows", "no-columns", "duplicate-columns"])
+    def df(self, request):
+        rng = np.random.default_rng(0)
+        df = pd.DataFrame(
+            {
+                "A": rng.normal(size=200),
+                "B": pd.Categorical(rng.choice(["x", "y", None], size=200)),
+                "C": rng.choice(["foo", "bar", "baz"], size=200),
+                "D": pd.date_range("20240101", periods=200, freq="h"),
+            }
+        )
+        if request.param == "multi-index":
+            df.index = pd.MultiIndex.from_arrays([df.index % 7, df["C"]])
+        elif request.param == "no-rows":
+            df = df.iloc[:0]
+        elif request.param == "no-columns":
+            df = df[[]]
+        elif request.param == "duplicate-columns":
+            df.columns = ["A", "A", "C", "C"]
+        return df
+
+    @pytest.mark.parametrize("chunk_rows", [1, 7, 10**6])
+    @pytest.mark.parametrize("max_workers", [None, 3])
+    def test_chunk_invariance(self, df, chunk_rows, max_workers):
+        with hashing_options(dataframe_chunk_rows=chunk_rows, max_workers=max_workers):
+            token = get_hash(df)
+        assert token == _whole_frame_token(df)
+
+    def test_streaming(self, df):
+        with hashing_options(engine="streaming"):
+            expected = _whole_frame_token(df)
+            with hashing_options(dataframe_chunk_rows=13):
+                assert get_hash(df) == expected
+
+
+def _fake_parquet(path, data, footer):
+    path.write_bytes(b"PAR1" + data + footer + len(footer).to_bytes(4, "little") + b"PAR1")
+
+
+class TestColumnarFingerprints:
+    def test_footer_only(self, tmp_path, monkeypatch):
+        path = tmp_path / "data.parquet"
+        _fake_parquet(path, b"rows" * 100, b"schema+stats")
+        with hashing_options(columnar_fingerprints=True):
+            token1 = get_hash(path)
+            monkeypatch.setattr(hashing, "_file_digest", lambda *args: pytest.fail("read rows"))
+            _fake_parquet(path, b"ROWS" * 100, b"schema+stats")
+            token2 = get_hash(path)
+            _fake_parquet(path, b"ROWS" * 100, b"schema+STATS")
+            token3 = get_hash(path)
+            _fake_parquet(path, b"ROWS" * 101, b"schema+STATS")
+            token4 = get_hash(path)
+        assert token1.startswith("s3-")
+        assert token1 == token2
+        assert len({token2, token3, token4}) == 3
+
+    @pytest.mark.parametrize(
+        "content", [b"not columnar", b"PAR1" + b"\xff\xff\xff\x7f" * 4 + b"PAR1"]
+    )
+    def test_other_files(self, tmp_path, content):
+        path = tmp_path / "data.bin"
+        path.write_bytes(content)
+        with hashing_options(engine="streaming"):
+            expected = get_hash(path)
+            with hashing_options(columnar_fingerprints=True):
+                assert get_hash(path) == expected
+
+    @pytest.mark.parametrize("fmt", ["parquet", "feather"])
+    def test_pyarrow_files(self, tmp_path, fmt):
+        pytest.importorskip("pyarrow")
+        df = pd.DataFrame({"a": range(100), "b": ["x"] * 100})
+        dataset = tmp_path / "dataset"
+        dataset.mkdir()
+        write = getattr(df, f"to_{fmt}")
+        write(dataset / f"part-0.{fmt}")
+        write(dataset / f"part-1.{fmt}")
+        with hashing_options(columnar_fingerprints=True):
+            token1 = get_hash(dataset)
+            df = pd.concat([df, df], ignore_index=True)
+            write = getattr(df, f"to_{fmt}")
+            write(dataset / f"part-1.{fmt}")
+            token2 = get_hash(dataset)
+        assert token1 != token2
+
+
+class TestManifests:
+    def test_build(self, golden_tree):
+        manifest = build_manifest(golden_tree)
+        assert sorted(manifest.files) == ["a/b/two.txt", "a/one.bin", "c/empty.txt", "top.txt"]
+        assert sorted(manifest.dirs) == ["", "a", "a/b", "c"]
+        assert build_manifest(golden_tree).root == manifest.root
+
+    def test_diff(self, golden_tree):
+        old = build_manifest(golden_tree)
+        (golden_tree / "a" / "b" / "two.txt").write_text("changed")
+        (golden_tree / "c" / "empty.txt").unlink()
+        (golden_tree / "c" / "new.txt").write_text("new")
+        new = build_manifest(golden_tree, previous=old)
+        diff = diff_manifests(old, new)
+        assert diff.added == ["c/new.txt"]
+        assert diff.removed == ["c/empty.txt"]
+        assert diff.modified == ["a/b/two.txt"]
+        assert old.dirs["a/b"] != new.dirs["a/b"]
+        assert diff_manifests(new, new).summary() == "no file changes"
+
+    def test_previous_skips_clean_files(self, golden_tree, monkeypatch):
+        past = time.time() - 60
+        for p in golden_tree.rglob("*"):
+            os.utime(p, (past, past))
+        old = build_manifest(golden_tree)
+        monkeypatch.setattr(hashing, "_file_digest", lambda path: pytest.fail(path))
+        assert build_manifest(golden_tree, previous=old) == old
+
+    def test_record(self, golden_tree, tmp_path):
+        assert record_manifest("foo", golden_tree) is None
+        with hashing_options(fingerprint_cache=tmp_path / "cache"):
+            assert record_manifest("foo", golden_tree) is None
+            (golden_tree / "top.txt").write_text("changed")
+            assert record_manifest("foo", golden_tree).modified == ["top.txt"]
+
+
+@pytest.fixture
+def memo():
+    clear_hash_memo()
+    with hashing_options(memo_max_bytes=10**9):
+        yield
+    clear_hash_memo()
+
+
+class TestMemo:
+    def test_frame_reused(self, memo, monkeypatch):
+        df = pd.DataFrame({"a": range(100), "b": ["x"] * 100})
+        token = get_hash(df)
+        monkeypatch.setattr(hashing, "_hash_data_frame", lambda *args: pytest.fail("recomputed"))
+        assert get_hash(df) == token
+
+    def test_frame_mutation_detected(self, memo):
+        df = pd.DataFrame({"a": range(100), "b": ["x"] * 100})
+        token = get_hash(df)
+        df["a"] = range(1, 101)
+        assert get_hash(df) != token
+        df.columns = ["c", "d"]
+        assert get_hash(df) != token
+        df.index = df.index + 1
+        assert get_hash(df) == get_hash(df.copy())
+
+    def test_path_reused_until_modified(self, memo, golden_tree, monkeypatch):
+        past = time.time() - 60
+        for p in golden_tree.rglob("*"):
+            os.utime(p, (past, past))
+        token = get_hash(golden_tree)
+        with monkeypatch.context() as m:
+            m.setattr(hashing, "_legacy_chain", lambda *args: pytest.fail("re-read"))
+            assert get_hash(golden_tree) == token
+        (golden_tree / "a" / "b" / "two.txt").write_text("changed")
+        assert get_hash(golden_tree) != token
+
+    def test_tokens_unchanged(self, golden_tree):
+        df = pd.DataFrame({"a": range(10)})
+        expected = get_hash(df, golden_tree)
+        clear_hash_memo()
+        with hashing_options(memo_max_bytes=10**9):
+            assert get_hash(df, golden_tree) == expected
+            assert get_hash(df, golden_tree) == expected
+            with hashing_options(engine="streaming"):
+                assert get_hash(df, golden_tree) != expected
+
+    def test_eviction_by_size(self, memo):
+        frames = [pd.DataFrame({"a": np.arange(1000) + i}) for i in range(4)]
+        size = int(frames[0].memory_usage(index=True).sum())
+        with hashing_options(memo_max_bytes=2 * size):
+            for df in frames:
+                get_hash(df)
+        assert len(hashing._memo) == 2
+        assert hashing._memo_bytes <= 2 * size
+
+    def test_invalid_option(self):
+        with pytest.raises(ValueError):
+            set_hashing_options(memo_max_bytes=-1)
+
+
+class TestBuffersAndSets:
+    def test_bytes_like(self):
+        token = get_hash(b"abc")
+        assert get_hash(bytearray(b"abc")) == token
+        assert get_hash(memoryview(b"abc")) == token
+
+    def test_pyarrow_buffer(self):
+        pa = pytest.importorskip("pyarrow")
+        assert get_hash(pa.py_buffer(b"abc")) == get_hash(b"abc")
+
+    def test_ndarray(self):
+        a = np.arange(12, dtype=np.int64)
+        token = get_hash(a)
+        assert get_hash(a.copy()) == token
+        assert get_hash(a.reshape(3, 4)) != token
+        assert get_hash(a.astype(np.int32)) != token
+        assert get_hash(a.reshape(3, 4).T) == get_hash(np.ascontiguousarray(a.reshape(3, 4).T))
+        assert get_hash(a[::2]) == get_hash(a[::2].copy())
+        assert get_hash(np.array(["a", None], dtype=object)) != get_hash(np.array(["a", "b"]))
+
+    def test_sets(self):
+        assert get_hash({3, 1, 2}) == get_hash(frozenset([2, 3, 1]))
+        assert get_hash({1, 2}) != get_hash({1, 3})
+        assert get_hash({"a", "b"}) == get_hash({"b", "a"})
+
+    def test_unsupported(self):
+        with pytest.raises(TypeError):
+            get_hash(object())
+
+
+def _compile(source):
+    namespace = {}
+    exec(source, namespace)
+    return namespace
+
+
+class TestBytecodeCallables:
+    @pytest.fixture(autouse=True)
+    def bytecode(self):
+        with hashing_options(callable_tokens="bytecode"):
+            yield
+
+    def test_ignores_formatting(self):
+        a = _compile("def f(x):\n    return x + 1\n")["f"]
+        b = _compile("\n\n# comment\ndef f(x):\n    return (x +\n        1)\n")["f"]
+        c = _compile("def f(x):\n    return x + 2\n")["f"]
+        assert get_hash(a) == get_hash(b)
+        assert get_hash(a) != get_hash(c)
+
+    def test_helpers_and_constants(self):
+        ns = _compile(
+            "SCALE = 2\ndef helper(x):\n    return x * SCALE\ndef f(x):\n    return helper(x)\n"
+        )
+        token = get_hash(ns["f"])
+        ns["SCALE"] = 3
+        assert get_hash(ns["f"]) != token
+        ns["SCALE"] = 2
+        assert get_hash(ns["f"]) == token
+        ns["helper"] = _compile("def helper(x):\n    return x - 1\n")["helper"]
+        assert get_hash(ns["f"]) != token
+
+    def test_closures_and_defaults(self):
+        def make(n, default=1):
+            def f(x, y=default):
+                return x + n + y
+
+            return f
+
+        assert get_hash(make(1)) == get_hash(make(1))
+        assert get_hash(make(1)) != get_hash(make(2))
+        assert get_hash(make(1)) != get_hash(make(1, default=2))
+
+    def test_recursion_and_untokenizable_closure(self):
+        ns = _compile("def f(n):\n    return 1 if n < 2 else n * f(n - 1)\n")
+        assert get_hash(ns["f"]) == get_hash(ns["f"])
+        lock = threading.Lock()
+        assert get_hash(lambda: lock) == get_hash(lambda: lock)
+
+    def test_library_functions_not_traversed(self, monkeypatch):
+        calls = []
+        fingerprint = hashing._code_fingerprint
+        monkeypatch.setattr(
+            hashing, "_code_fingerprint", lambda code: calls.append(code) or fingerprint(code)
+        )
+        ns = _compile("from pandas import concat\ndef f(df):\n    return concat([df])\n")
+        get_hash(ns["f"])
+        assert ns["f"].__code__ in calls
+        assert pd.concat.__code__ not in calls
+
+    def test_source_is_default(self):
+        def f():
+            pass
+
+        with hashing_options(callable_tokens="source"):
+            source_token = get_hash(f)
+        assert get_hash(f) != source_token
+        with pytest.raises(ValueError):
+            set_hashing_options(callable_tokens="ast")
+
+
+class TestAsync:
+    def test_matches_get_hash(self, golden_tree):
+        df = pd.DataFrame({"a": range(10)})
+        args = ("name", df, golden_tree, [1, 2])
+        assert asyncio.run(get_hash_async(*args, frame=df)) == get_hash(*args, frame=df)
+
+    def test_scoped_options(self):
+        async def scoped():
+            with hashing_options(engine="streaming"):
+                return await get_hash_async("foo")
+
+        with hashing_options(engine="streaming"):
+            expected = get_hash("foo")
+        assert asyncio.run(scoped()) == expected
+
+    def test_process_pool(self):
+        df = pd.DataFrame({"a": range(100), "b": ["x"] * 100})
+        with hashing_options(algorithm="blake2b"):
+            expected = get_hash("name", df, frame=df)
+        with hashing_options(algorithm="blake2b", dataframe_processes=1):
+            assert asyncio.run(get_hash_async("name", df, frame=df)) == expected
+
+
+class TestMmap:
+    @pytest.mark.parametrize("engine", ["legacy", "streaming"])
+    def test_tokens_unchanged(self, golden_tree, engine):
+        with hashing_options(engine=engine, mmap_threshold=None):
+            expected = [get_hash(golden_tree), get_hash(golden_tree / "top.txt")]
+        with hashing_options(engine=engine, mmap_threshold=1):
+            assert [get_hash(golden_tree), get_hash(golden_tree / "top.txt")] == expected
+
+    def test_fallback(self, golden_tree, monkeypatch):
+        expected = get_hash(golden_tree / "top.txt")
+
+        def unsupported(*args, **kwargs):
+            raise OSError("mmap not supported")
+
+        monkeypatch.setattr(hashing.mmap, "mmap", unsupported)
+        with hashing_options(mmap_threshold=1):
+            assert get_hash(golden_tree / "top.txt") == expected
+
+
+class TestCanonicalEncoding:
+    @pytest.fixture(autouse=True)
+    def streaming(self):
+        with hashing_options(engine="streaming"):
+            yield
+
+    def test_golden(self):
+        token = get_hash({"foo": "bar", "bar": [1, 2, 3.0], "n": None}, "x", k={"a": (1, 2)})
+        assert token == "s3-bf55471"
+
+    def test_key_order(self):
+        assert get_hash({"a": 1, "b": {"c": 2, "d": 3}}) == get_hash(
+            {"b": {"d": 3, "c": 2}, "a": 1}
+        )
+        assert get_hash({1: "a", "1": "b"}) == get_hash({"1": "b", 1: "a"})
+
+    @pytest.mark.parametrize(
+        "a, b",
+        [
+            (1, "1"),
+            (1, 1.0),
+            (1, True),
+            (0, None),
+            ([1, 2], [[1], 2]),
+            (["ab"], ["a", "b"]),
+            ({"a": 1}, [("a", 1)]),
+            ({1, 2}, [1, 2]),
+            (b"ab", "ab"),
+            (np.arange(3), [0, 1, 2]),
+        ],
+    )
+    def test_types_distinguished(self, a, b):
+        assert get_hash(a) != get_hash(b)
+
+    def test_str_subclasses(self):
+        class Color(str, enum.Enum):
+            RED = "abc"
+
+        assert get_hash(Color.RED) == get_hash("abc")
+        assert get_hash(Color.RED) != get_hash(["a", "b", "c"])
+        assert get_hash({Color.RED: 1}) == get_hash({"abc": 1})
+
+    def test_full_digest(self):
+        digest = get_digest({"p": 0.1}, flag=True)
+        assert len(digest) == 64
+        with hashing_options(engine="streaming"):
+            assert get_digest({"p": 0.1}, flag=True) == digest
+        assert get_digest({"p": 0.10000000001}, flag=True) != digest
+        assert get_digest({"p": 0.1}, flag=1) != digest
+
+    def test_full_digest_of_data_frames(self):
+        df = pd.DataFrame({"a": range(5)})
+        with hashing_options(engine="streaming"):
+            token = get_hash(df)
+        encoder = hashing._CanonicalEncoder("sha256", full=True)
+        encoder.encode({"frame": df})
+        full = hashing._hash_data_frame(df, "streaming", "sha256", full=True)
+        assert len(full) == 64
+        assert full.encode("utf-8") in encoder.buffer
+        assert token.encode("utf-8") not in encoder.buffer
+        assert get_digest(df) != get_digest(df.iloc[:4])
+
+    def test_args_and_kwargs_distinguished(self):
+        assert get_hash("a", "b") != get_hash("ab")
+        assert get_hash(a=1) != get_hash("a", 1)
+
+    def test_leaves(self, golden_tree):
+        df = pd.DataFrame({"a": range(5)})
+        nested = {"frame": df, "path": golden_tree, "array": np.arange(4), "objects": {1, 2}}
+        assert get_hash([nested]) == get_hash([nested])
+        assert get_hash({"frame": df}) != get_hash({"frame": df.iloc[:4]})
+
+    def test_large_ints(self):
+        assert len({get_hash(n) for n in [-(2**70), -129, -128, -1, 0, 127, 128, 2**70]}) == 8
@@ -0,0 +1,111 @@
+#
+# Copyright 2024 DataRobot, Inc. and its affiliates.
+#
+# All rights reserved.
+#
+# DataRobot, Inc.
+#
+# This is proprietary source code of DataRobot, Inc. and its
+# affiliates.
+#
+# Released under the terms of DataRobot Tool and Utility Agreement.
+# https://www.datarobot.com/wp-content/uploads/2021/07/DataRobot-Tool-and-Utility-Agreement.pdf
+
+import pytest
+
+from datarobotx.idp.common.hashing import get_hash, hashing_options
+from datarobotx.idp.common.ignore import IgnoreRules, iter_files
+
+
+@pytest.fixture
+def project(tmp_path):
+    base = tmp_path / "project"
+    (base / ".git" / "objects").mkdir(parents=True)
+    (base / "src" / "__pycache__").mkdir(parents=True)
+    (base / ".git" / "HEAD").write_text("ref: refs/heads/main")
+    (base / "src" / "__pycache__" / "main.cpython-311.pyc").write_bytes(b"\0")
+    (base / "src" / "main.py").write_text("print('hi')")
+    (base / "debug.log").write_text("log")
+    (base / "keep.log").write_text("keep")
+    return base
+
+
+@pytest.mark.parametrize(
+    "pattern, path, is_dir, ignored",
+    [
+        ("__pycache__/", "src/__pycache__", True, True),
+        ("__pycache__/", "src/__pycache__", False, False),
+        ("*.log", "a/b/debug.log", False, True),
+        ("/*.log", "a/debug.log", False, False),
+        ("/*.log", "debug.log", False, True),
+        ("docs/*.md", "docs/a.md", False, True),
+        ("docs/*.md", "docs/sub/a.md", False, False),
+        ("docs/**/*.md", "docs/sub/a.md", False, True),
+        ("**/.ipynb_checkpoints", "a/b/.ipynb_checkpoints", True, True),
+        ("file[0-9].txt", "file1.txt", False, True),
+        ("file[!0-9].txt", "file1.txt", False, False),
+        ("# comment", "# comment", False, False),
+    ],
+)
+def test_patterns(pattern, path, is_dir, ignored):
+    assert IgnoreRules([pattern]).is_ignored(path, is_dir) == ignored
+
+
+def test_negation():
+    rules = IgnoreRules(["*.log", "!keep.log"])
+    assert rules.is_ignored("debug.log", False)
+    assert not rules.is_ignored("keep.log", False)
+
+
+def test_anchored():
+    assert not IgnoreRules(["*.log"], anchored=True).is_ignored("a/debug.log", False)
+    assert IgnoreRules(["**/*.log"], anchored=True).is_ignored("a/debug.log", False)
+
+
+def test_iter_files(project):
+    (project / ".dripignore").write_text(".git/\n__pycache__/\n*.log\n!keep.log\n")
+    rel_paths = sorted(rel for _, rel in iter_files(project))
+    assert rel_paths == [".dripignore", "keep.log", "src/main.py"]
+    assert len(list(iter_files(project, None))) == 6
+
+
+@pytest.mark.parametrize("engine", ["legacy", "streaming"])
+def test_ignored_files_do_not_affect_tokens(project, engine):
+    with hashing_options(engine=engine):
+        unfiltered = get_hash(project)
+        (project / ".dripignore").write_text(".git/\n__pycache__/\n*.log\n")
+        token = get_hash(project)
+        assert token != unfiltered
+        (project / ".git" / "HEAD").write_text("ref: refs/heads/other")
+        (project / "debug.log").write_text("more log")
+        (project / "src" / "__pycache__" / "new.pyc").write_bytes(b"\1")
+        assert get_hash(project) == token
+        (project / "src" / "main.py").write_text("print('bye')")
+        assert get_hash(project) != token
+        with hashing_options(ignore_file=None):
+            assert get_hash(project) != token
+
+
+def test_dockerignore(project):
+    (project / ".dockerignore").write_text(".git\n**/__pycache__\n")
+    with hashing_options(ignore_file=".dockerignore"):
+        token = get_hash(project)
+        (project / ".git" / "HEAD").write_text("ref: refs/heads/other")
+        assert get_hash(project) == token
+    assert get_hash(project) != token
+
+
+def test_dockerignore_reinclude(project):
+    (project / ".dockerignore").write_text("*\n!Dockerfile\n!src/main.py\n")
+    (project / "Dockerfile").write_text("FROM python")
+    rules = IgnoreRules((project / ".dockerignore").read_text().splitlines(), anchored=True)
+    assert rules.is_ignored("src/other.py", False)
+    assert not rules.is_ignored("src/main.py", False)
+    rel_paths = sorted(rel for _, rel in iter_files(project, ".dockerignore"))
+    assert rel_paths == ["Dockerfile", "src/main.py"]
+    with hashing_options(ignore_file=".dockerignore"):
+        token = get_hash(project)
+        (project / "debug.log").write_text("more log")
+        assert get_hash(project) == token
+        (project / "src" / "main.py").write_text("print('bye')")
+        assert get_hash(project) != token
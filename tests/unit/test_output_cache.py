@@ -0,0 +1,56 @@
+#
+# Copyright 2024 DataRobot, Inc. and its affiliates.
+#
+# All rights reserved.
+#
+# DataRobot, Inc.
+#
+# This is proprietary source code of DataRobot, Inc. and its
+# affiliates.
+#
+# Released under the terms of DataRobot Tool and Utility Agreement.
+# https://www.datarobot.com/wp-content/uploads/2021/07/DataRobot-Tool-and-Utility-Agreement.pdf
+
+import pandas as pd
+
+from datarobotx.idp.common.output_cache import OutputCache
+
+
+def test_roundtrip(tmp_path):
+    cache = OutputCache(str(tmp_path / "cache"))
+    assert cache.get("node", "abc") is None
+    df = pd.DataFrame({"a": [1, 2]})
+    cache.put("node", "abc", {"out": df})
+    assert cache.get("node", "abc")["out"].equals(df)
+    assert cache.get("other_node", "abc") is None
+
+
+def test_lru_eviction(tmp_path):
+    cache = OutputCache(str(tmp_path / "cache"), max_entries=2)
+    cache.put("node", "a", {"out": 1})
+    cache.put("node", "b", {"out": 2})
+    assert cache.get("node", "a") == {"out": 1}
+    cache.put("node", "c", {"out": 3})
+    assert cache.get("node", "b") is None
+    assert cache.get("node", "a") == {"out": 1}
+    assert cache.get("node", "c") == {"out": 3}
+    entries = (tmp_path / "cache" / "node").glob("*.pkl")
+    assert sorted(p.name for p in entries) == ["a.pkl", "c.pkl"]
+
+
+def test_size_eviction(tmp_path):
+    cache = OutputCache(str(tmp_path / "cache"), max_bytes=1500)
+    cache.put("node", "a", {"out": b"x" * 1000})
+    cache.put("node", "b", {"out": b"y" * 1000})
+    assert cache.get("node", "a") is None
+    assert cache.get("node", "b") == {"out": b"y" * 1000}
+
+
+def test_shared_between_instances(tmp_path):
+    first = OutputCache(str(tmp_path / "cache"), max_entries=2)
+    second = OutputCache(str(tmp_path / "cache"), max_entries=2)
+    first.put("node", "a", {"out": 1})
+    second.put("node", "b", {"out": 2})
+    first.put("node", "c", {"out": 3})
+    assert len(list((tmp_path / "cache" / "node").glob("*.pkl"))) == 2
+    assert second.get("node", "a") is None